@@ -0,0 +1,237 @@
+import argparse
+import importlib
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+# Every variant of the questions, with the kind of input its function takes:
+# "records" a list of tweets, "stream" an iterator of tweets, "path" the path of the dump.
+variants = {
+    "time": "records",
+    "memory": "stream",
+    "parallel": "path",
+    "out_of_core": "path",
+}
+
+questions = ("q1", "q2", "q3")
+sources = ("gcs", "local")
+
+
+def timed_import(name: str) -> Tuple[object, float, List[str]]:
+    """
+    Import a module, measuring how long it takes and which packages it brings in.
+
+    Parameters:
+        name (str): Dotted name of the module.
+    Returns:
+        Tuple[object, float, List[str]]: The module, the seconds spent importing it and the
+        third-party packages that were not imported before.
+    """
+    before = set(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    seconds = time.perf_counter() - start
+    stdlib = getattr(sys, "stdlib_module_names", ())
+    new_packages = sorted(
+        package
+        for package in {module_name.split(".")[0] for module_name in set(sys.modules) - before}
+        if package != "src" and package not in stdlib and not package.startswith("_")
+    )
+    return module, seconds, new_packages
+
+
+def load_input(
+        kind: str,
+        source: str,
+        file_path: Optional[str],
+        fields: Sequence[str],
+        use_cache: bool,
+        batch: bool,
+        errors=None,
+        start: int = 0
+):
+    """
+    Build the input of a variant from the selected source.
+
+    The loaders are imported here, once the variant is known, so the Google Cloud and Arrow
+    libraries are only loaded by the code paths that use them.
+
+    Parameters:
+        kind (str): Kind of input of the variant, see variants.
+        source (str): "gcs" for the blob of the constants, "local" for a local copy of the dump.
+        file_path (str, optional): Path of the local dump. None means json_file_local_path.
+        fields (Sequence[str]): Fields read by the question.
+        use_cache (bool): Read the columnar cache instead of parsing the JSON.
+        batch (bool): Load the tweets into a TweetBatch instead of dicts.
+        errors (ParseErrorPolicy, optional): Skip the malformed lines of the JSON as the policy says.
+            Defaults to None, failing on the first one.
+        start (int, optional): Byte offset of the line to start the JSON from, to resume a run. Defaults to 0.
+    Returns:
+        The list, stream, TweetBatch or path handed to the variant function.
+    """
+    from src.common.gcs.constants import gcs_blob_name, gcs_bucket_name, json_file_local_path
+
+    file_path = file_path or json_file_local_path
+    if kind == "path":
+        return f"gs://{gcs_bucket_name}/{gcs_blob_name}" if source == "gcs" else file_path
+
+    from src.common.gcs import google_storage
+
+    if batch:
+        return google_storage.load_batch_from_gcs() if source == "gcs" else google_storage.load_batch_from_local(file_path)
+    if kind == "records" and start:
+        if source == "gcs":
+            return list(google_storage.stream_json_from_gcs(fields=fields, errors=errors, start=start))
+        return list(google_storage.stream_json_from_local(file_path, fields=fields, errors=errors, start=start))
+    if kind == "records":
+        if source == "gcs":
+            return google_storage.load_json_from_gcs(fields=fields, use_cache=use_cache, errors=errors)
+        return google_storage.load_json_from_local(fields=fields, use_cache=use_cache, file_path=file_path, errors=errors)
+    if source == "gcs":
+        return google_storage.stream_json_from_gcs(fields=fields, use_cache=use_cache, errors=errors, start=start)
+    return google_storage.stream_json_from_local(file_path, fields=fields, use_cache=use_cache, errors=errors, start=start)
+
+
+def print_resume(error) -> None:
+    """
+    Print an ErrorBudgetExceeded, with the --start offset to resume after the failing line when it is known.
+    """
+    if error.next_offset is None:
+        print(error)
+    else:
+        print(f"{error}. Resume after the line with --start {error.next_offset}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="latam-tweets",
+        description="Answer a question of the challenge with one of its variants.",
+    )
+    parser.add_argument("question", choices=questions)
+    parser.add_argument("--variant", choices=sorted(variants), default="memory")
+    parser.add_argument("--source", choices=sources, default="gcs")
+    parser.add_argument("--file", help="Path of the local dump, for --source local. Defaults to json_file_local_path.")
+    parser.add_argument("--cache", action="store_true", help="Read the columnar cache instead of parsing the JSON.")
+    parser.add_argument("--batch", action="store_true", help="Load the tweets into a compact TweetBatch.")
+    parser.add_argument(
+        "--max-errors",
+        type=int,
+        help="Skip up to this many malformed lines instead of failing on the first one (time and memory variants).",
+    )
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        help="Also stop when more than this share of the lines read are malformed, e.g. 0.01 (with --max-errors).",
+    )
+    parser.add_argument("--dead-letter", help="File receiving the malformed lines skipped by --max-errors.")
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="Byte offset of the line to start the JSON from, e.g. to resume after an exhausted error budget.",
+    )
+    parser.add_argument("--import-times", action="store_true", help="Report the time spent importing modules.")
+    parser.add_argument(
+        "--instrument",
+        nargs="?",
+        const="on",
+        choices=("on", "cprofile", "pyinstrument"),
+        help="Collect counters and spans, optionally profiling the run, and print them at the end.",
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    In this main function:
+    1. The arguments are parsed before anything heavy is imported, so --help and mistakes are instant.
+    2. The module of the selected variant is imported, and with it only the libraries it needs.
+    3. The input is built from the selected source and the variant function is executed. With --max-errors
+       the malformed lines are skipped, and the offset to resume from is printed if there are too many.
+    4. The answer is printed with the loading and processing times, and the import times if asked.
+
+    Example:
+        python -m src q3 --variant memory --source local --file farmers-protest-tweets-2021-2-4.json --import-times
+        python -m src q1 --variant time --source local --max-errors 100 --dead-letter bad-lines.json
+    Returns:
+        int: The exit status, 1 if the variant failed.
+    """
+    args = build_parser().parse_args(argv)
+    kind = variants[args.variant]
+    if args.variant == "parallel" and args.source == "gcs":
+        build_parser().error("the parallel variant reads a local file, use --source local")
+    if kind == "path" and (args.cache or args.batch):
+        build_parser().error(f"--cache and --batch do not apply to the {args.variant} variant")
+    if args.max_errors is not None and (kind == "path" or args.batch):
+        build_parser().error("--max-errors only applies to the time and memory variants without --batch")
+    if (args.dead_letter or args.max_error_rate is not None) and args.max_errors is None:
+        build_parser().error("--dead-letter and --max-error-rate require --max-errors")
+    if args.start and (kind == "path" or args.batch or args.cache):
+        build_parser().error("--start only applies to the time and memory variants reading the JSON")
+
+    import_times = []
+
+    def import_module(name: str):
+        module, seconds, new_packages = timed_import(name)
+        import_times.append((name, seconds, new_packages))
+        return module
+
+    if args.instrument:
+        instrumentation = import_module("src.common.instrumentation")
+        instrumentation.enable(None if args.instrument == "on" else args.instrument)
+
+    module = import_module(f"src.{args.question}.{args.variant}")
+    constants = import_module("src.common.gcs.constants")
+    if kind != "path":
+        import_module("src.common.gcs.google_storage")
+    function = getattr(module, f"{args.question}_{args.variant}")
+    fields = getattr(constants, f"{args.question}_fields")
+
+    parse_errors = import_module("src.common.gcs.parse_errors")
+    errors = None
+    if args.max_errors is not None:
+        errors = parse_errors.ParseErrorPolicy(
+            max_errors=args.max_errors,
+            max_error_rate=args.max_error_rate,
+            dead_letter_path=args.dead_letter,
+        )
+
+    start_load_time = time.time()
+    try:
+        gcp_input = load_input(kind, args.source, args.file, fields, args.cache, args.batch, errors, args.start)
+    except parse_errors.ErrorBudgetExceeded as e:
+        print_resume(e)
+        return 1
+    end_load_time = time.time()
+
+    start_processing_time = time.time()
+    if kind == "path":
+        result = function(gcp_input)
+    else:
+        result = function(gcp_file=gcp_input)
+    end_processing_time = time.time()
+
+    print(result)
+    if kind == "records" or args.batch:
+        print(f"Total time loading tweets: {end_load_time - start_load_time}, sec")
+    print(f"Total time processing tweets: {end_processing_time - start_processing_time}, sec")
+
+    if args.import_times:
+        print("Import times:")
+        for name, seconds, new_packages in import_times:
+            print(f"    {name}: {seconds:.4f}, sec ({', '.join(new_packages) or 'no new packages'})")
+
+    if errors is not None:
+        print(f"Malformed lines: {errors.summary()}")
+        if errors.exceeded is not None:
+            print_resume(errors.exceeded)
+            result = None
+
+    if args.instrument:
+        instrumentation.print_report()
+
+    return 0 if result is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class TweetBatch:
+    """
+    Compact columnar store of the fields read by q1, q2 and q3.
+
+    Instead of one dict per tweet (with nested dicts for the user), the batch keeps:
+    - usernames dictionary encoded: every distinct username is stored once and each tweet
+      holds its int32 code,
+    - days as int32 ordinals (datetime.date.toordinal) of the UTC day of the tweet,
+    - contents as one contiguous UTF-8 buffer, every content followed by a newline, with the
+      int64 offset where each one starts.
+
+    The q1, q2 and q3 functions accept a TweetBatch in place of a list of tweets.
+    """
+
+    def __init__(self):
+        self.usernames: List[str] = []
+        self.user_codes = array('i')
+        self.days = array('i')
+        self.content = bytearray()
+        self.content_offsets = array('q', [0])
+        self._username_codes: Dict[str, int] = {}
+        self._day_ordinals: Dict[str, int] = {}
+
+    @classmethod
+    def from_tweets(cls, tweets: Iterable[dict]) -> "TweetBatch":
+        """
+        Build a batch from tweets, e.g. a projected stream from stream_json_from_local.
+
+        Parameters:
+            tweets (Iterable[dict]): Tweets with at least 'date', 'user.username' and 'content'.
+        Returns:
+            TweetBatch: The batch holding every tweet.
+        """
+        batch = cls()
+        batch.extend(tweets)
+        return batch
+
+    def extend(self, tweets: Iterable[dict]) -> None:
+        """
+        Append tweets to the batch.
+
+        Parameters:
+            tweets (Iterable[dict]): Tweets with at least 'date', 'user.username' and 'content'.
+        """
+        username_codes, day_ordinals = self._username_codes, self._day_ordinals
+        usernames, user_codes, days = self.usernames, self.user_codes, self.days
+        content, content_offsets = self.content, self.content_offsets
+
+        for tweet in tweets:
+            username = tweet["user"]["username"]
+            code = username_codes.get(username)
+            if code is None:
+                code = username_codes[username] = len(usernames)
+                usernames.append(username)
+            user_codes.append(code)
+
+            day = tweet["date"][:10]
+            ordinal = day_ordinals.get(day)
+            if ordinal is None:
+                ordinal = day_ordinals[day] = date.fromisoformat(day).toordinal()
+            days.append(ordinal)
+
+            content += (tweet.get("content") or "").encode()
+            content += b"\n"
+            content_offsets.append(len(content))
+
+    def __len__(self) -> int:
+        return len(self.user_codes)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the columns, excluding the distinct username strings.
+
+        Returns:
+            int: Size in bytes of the codes, days, content buffer and offsets.
+        """
+        return (
+            self.user_codes.itemsize * len(self.user_codes)
+            + self.days.itemsize * len(self.days)
+            + len(self.content)
+            + self.content_offsets.itemsize * len(self.content_offsets)
+        )
+
+    def iso_days(self) -> Iterator[str]:
+        """
+        Day of every tweet as a 'YYYY-MM-DD' string, in tweet order.
+
+        Returns:
+            Iterator[str]: The days, decoded lazily from the ordinals.
+        """
+        names = {ordinal: day for day, ordinal in self._day_ordinals.items()}
+        return map(names.__getitem__, self.days)
+
+    def user_names(self) -> Iterator[str]:
+        """
+        Username of every tweet, in tweet order.
+
+        Returns:
+            Iterator[str]: The usernames, decoded lazily from the codes.
+        """
+        return map(self.usernames.__getitem__, self.user_codes)
+
+    def sorted_user_codes(self) -> Tuple[array, List[str]]:
+        """
+        Re-encode the usernames so that codes follow the alphabetical order of the usernames.
+
+        Returns:
+            Tuple[array, List[str]]: The code of every tweet and the sorted distinct usernames.
+        """
+        order = sorted(range(len(self.usernames)), key=self.usernames.__getitem__)
+        ranks = [0] * len(order)
+        for rank, code in enumerate(order):
+            ranks[code] = rank
+        return array('i', map(ranks.__getitem__, self.user_codes)), [self.usernames[code] for code in order]
+
+    def iter_contents(self) -> Iterator[str]:
+        """
+        Content of every tweet, decoded one at a time, in tweet order.
+
+        Returns:
+            Iterator[str]: The contents.
+        """
+        content, offsets = self.content, self.content_offsets
+        for index in range(len(offsets) - 1):
+            yield content[offsets[index]:offsets[index + 1] - 1].decode()
+
+    def joined_content(self) -> str:
+        """
+        Contents of all the tweets separated by newlines, decoded in a single call.
+
+        Useful to scan the whole column with one regex call; the newline separator keeps
+        patterns from matching across two tweets.
+
+        Returns:
+            str: The whole content column.
+        """
+        return self.content.decode()
@@ -0,0 +1,214 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+from memory_profiler import memory_usage
+
+from src.common.synthetic import generate_tweets
+from src.q1.memory import q1_memory
+from src.q1.time import q1_time
+from src.q2.memory import q2_memory
+from src.q2.time import q2_time
+from src.q3.memory import q3_memory
+from src.q3.time import q3_time
+
+# Variants under benchmark, called with a list of tweets.
+variants: Dict[str, Callable[[List[dict]], list]] = {
+    "q1_time": q1_time,
+    "q1_memory": q1_memory,
+    "q2_time": q2_time,
+    "q2_memory": q2_memory,
+    "q3_time": q3_time,
+    "q3_memory": q3_memory,
+}
+
+default_sizes = [10_000, 100_000]
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    Percentile of a sample, interpolating linearly between the closest ranks.
+
+    Parameters:
+        values (Sequence[float]): Sample, in any order.
+        fraction (float): Percentile between 0 and 1, e.g. 0.9 for p90.
+    Returns:
+        float: The interpolated percentile.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def benchmark_variant(
+        function: Callable[[List[dict]], list],
+        tweets: List[dict],
+        repeat: int,
+        warmup: int
+) -> dict:
+    """
+    Measure one variant on one dataset.
+
+    The wall-clock time is measured on repeat runs after warmup discarded runs. The peak RSS is
+    the highest resident set size sampled by memory_profiler during an extra run, and the
+    allocations are measured with tracemalloc on another run, since tracing slows the code down.
+
+    Parameters:
+        function (Callable[[List[dict]], list]): Variant to run.
+        tweets (List[dict]): Dataset passed to the variant.
+        repeat (int): Number of measured runs.
+        warmup (int): Number of discarded runs before the measured ones.
+    Returns:
+        dict: The wall-clock statistics in seconds, the baseline and peak RSS in MiB and the
+        tracemalloc peak in bytes.
+    """
+    for _ in range(warmup):
+        function(tweets)
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function(tweets)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    baseline_rss = memory_usage(-1, interval=0.01, timeout=0.05, max_usage=True)
+    peak_rss = memory_usage((function, (tweets,)), interval=0.01, max_usage=True)
+
+    gc.collect()
+    tracemalloc.start()
+    function(tweets)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall_seconds": {
+            "min": min(timings),
+            "p50": percentile(timings, 0.5),
+            "p90": percentile(timings, 0.9),
+            "p99": percentile(timings, 0.99),
+            "max": max(timings),
+            "mean": sum(timings) / len(timings),
+        },
+        "baseline_rss_mib": baseline_rss if isinstance(baseline_rss, float) else max(baseline_rss),
+        "peak_rss_mib": peak_rss if isinstance(peak_rss, float) else max(peak_rss),
+        "tracemalloc_peak_bytes": traced_peak,
+    }
+
+
+def run_benchmark(
+        names: Sequence[str],
+        sizes: Sequence[int],
+        repeat: int = 5,
+        warmup: int = 1,
+        seed: int = 0
+) -> dict:
+    """
+    Benchmark the given variants on synthetic datasets of the given sizes.
+
+    Parameters:
+        names (Sequence[str]): Keys of variants to run.
+        sizes (Sequence[int]): Number of tweets of every dataset.
+        repeat (int, optional): Number of measured runs per variant and size. Defaults to 5.
+        warmup (int, optional): Number of discarded runs per variant and size. Defaults to 1.
+        seed (int, optional): Seed of the synthetic datasets. Defaults to 0.
+    Returns:
+        dict: A 'meta' entry describing the run and one 'results' entry per variant and size.
+    """
+    results = []
+    for size in sizes:
+        tweets = list(generate_tweets(size, seed))
+        for name in names:
+            print(f"Benchmarking {name} on {size} tweets")
+            results.append({"variant": name, "size": size, **benchmark_variant(variants[name], tweets, repeat, warmup)})
+        del tweets
+
+    return {
+        "meta": {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "warmup": warmup,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def find_regressions(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Compare the median wall-clock time of two benchmark runs.
+
+    Parameters:
+        current (dict): Output of run_benchmark.
+        baseline (dict): Output of an earlier run_benchmark, e.g. loaded from its JSON file.
+        threshold (float): Tolerated relative slowdown, e.g. 0.1 for 10%.
+    Returns:
+        List[str]: A description of every variant and size whose p50 grew beyond the threshold.
+    """
+    previous = {(result["variant"], result["size"]): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["variant"], result["size"]))
+        if before is None:
+            continue
+        old, new = before["wall_seconds"]["p50"], result["wall_seconds"]["p50"]
+        if new > old * (1 + threshold):
+            regressions.append(f"{result['variant']} on {result['size']} tweets: p50 {old:.4f}s -> {new:.4f}s")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    In this main function:
+    1. The variants are benchmarked on synthetic datasets of several sizes.
+    2. The results are printed, and written as JSON when an output path is given.
+    3. When a baseline JSON is given, the variants slower than the threshold are reported and
+       the process exits with status 1.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the q1, q2 and q3 variants.")
+    parser.add_argument("--variants", nargs="+", choices=sorted(variants), default=list(variants))
+    parser.add_argument("--sizes", nargs="+", type=int, default=default_sizes)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path of the JSON file to write the results to.")
+    parser.add_argument("--baseline", help="Path of an earlier JSON output to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.variants, args.sizes, args.repeat, args.warmup, args.seed)
+
+    for result in report["results"]:
+        wall = result["wall_seconds"]
+        print(
+            f"{result['variant']:<10} {result['size']:>9} tweets  "
+            f"p50 {wall['p50']:.4f}s  p90 {wall['p90']:.4f}s  "
+            f"peak RSS {result['peak_rss_mib']:.1f} MiB  "
+            f"traced peak {result['tracemalloc_peak_bytes'] / 2 ** 20:.1f} MiB"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(report, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
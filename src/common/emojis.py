@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Pattern, Tuple
+
+
+def _build_trie(sequences: Iterable[str]) -> dict:
+    trie = {}
+    for sequence in sequences:
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return trie
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Turn a trie of code points into a regex where every level branches on a single code point.
+
+    The optional groups are greedy, so the longest known sequence wins: "👍🏽" is matched as one
+    emoji instead of "👍" followed by the skin tone modifier "🏽".
+    """
+    leaves = [char for char, child in node.items() if char and list(child) == [""]]
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in node.items() if char and list(child) != [""]]
+    if leaves:
+        escaped = "".join(re.escape(char) for char in sorted(leaves))
+        branches.append(escaped if len(leaves) == 1 else f"[{escaped}]")
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+def _candidate_pattern(sequences: Iterable[str]) -> str:
+    """
+    Regex of the runs of text that can contain an emoji: non-ASCII characters, optionally
+    preceded by one of the ASCII characters that start an emoji (the keycaps "#", "*" and digits).
+
+    The trie regex tries one branch per first code point at every position, so running it only
+    on these short runs skips the ASCII bulk of the tweets.
+    """
+    ascii_starts = sorted({sequence[0] for sequence in sequences if sequence[0].isascii()})
+    prefix = f"[{''.join(re.escape(char) for char in ascii_starts)}]?" if ascii_starts else ""
+    return f"{prefix}[^\\x00-\\x7f]+"
+
+
+@lru_cache(maxsize=None)
+def emoji_patterns() -> Tuple[Pattern, Pattern]:
+    """
+    Compile the candidate and emoji regexes from the emoji library catalog, on first use.
+
+    Importing the catalog and building the trie regex takes about a tenth of a second, which the
+    code paths that never look for emojis (q1, q3) do not need to pay.
+
+    Returns:
+        Tuple[Pattern, Pattern]: The regex of the candidate runs and the trie regex of the emojis.
+    """
+    import emoji
+
+    catalog = emoji.UNICODE_EMOJI["en"]
+    return re.compile(_candidate_pattern(catalog)), re.compile(_trie_pattern(_build_trie(catalog)))
+
+
+def extract_emojis(text: str) -> List[str]:
+    """
+    Extract the complete emoji sequences of a text.
+
+    Multi code point emojis such as flags, skin tone variants and ZWJ sequences are returned as a
+    single item, matched with a regex compiled once from the emoji library catalog, see emoji_patterns.
+    Only the non-ASCII runs of the text are handed to that regex, see _candidate_pattern.
+
+    Parameters:
+        text (str): Text to scan.
+    Returns:
+        List[str]: The emojis found, in order of appearance.
+    """
+    candidate_pattern, emoji_pattern = emoji_patterns()
+    emojis = []
+    for run in candidate_pattern.findall(text):
+        emojis += emoji_pattern.findall(run)
+    return emojis
@@ -0,0 +1,198 @@
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from src.common import instrumentation
+from src.common.emojis import extract_emojis
+from src.common.gcs.constants import q1_fields, q2_fields, q3_fields
+from src.common.gcs.google_storage import stream_json_from_gcs
+from src.common.grouping import top_k_from_pair_counts
+from src.common.mentions import extract_mentions
+
+# Version of what the aggregators count, stored with their persisted states (see incremental and
+# index). Bump it when an aggregator or an extractor it uses changes, so the states are rebuilt.
+aggregator_version = 2
+
+
+class Aggregator:
+    """
+    Base class for the aggregators fed by run_queries.
+
+    An aggregator receives every tweet once through update and builds its answer in result.
+    Aggregators fed with disjoint parts of the data can be combined with merge.
+    Subclasses declare the fields they read, so the loader can project the union of them.
+    """
+    name: str = ""
+    fields: Sequence[str] = ()
+
+    def update(self, tweet: dict) -> None:
+        raise NotImplementedError
+
+    def merge(self, other: "Aggregator") -> None:
+        raise NotImplementedError
+
+    def result(self) -> list:
+        raise NotImplementedError
+
+
+class TopDatesAggregator(Aggregator):
+    """
+    Top dates by number of tweets, with the user that published the most on each of them (q1).
+    Ties are broken as in q1_time: the earlier date and the username that sorts first win.
+    """
+    name = "q1"
+    fields = q1_fields
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.user_date_counter = Counter()
+
+    def update(self, tweet: dict) -> None:
+        self.user_date_counter[(tweet["date"][:10], tweet["user"]["username"])] += 1
+
+    def merge(self, other: "TopDatesAggregator") -> None:
+        self.user_date_counter.update(other.user_date_counter)
+
+    def result(self) -> List[Tuple[datetime.date, str]]:
+        return [
+            (datetime.strptime(date, "%Y-%m-%d").date(), top_users[0][0])
+            for date, top_users in top_k_from_pair_counts(self.user_date_counter, k_groups=self.top, k_items=1)
+        ]
+
+
+class EmojiAggregator(Aggregator):
+    """
+    Most used emojis with their counts (q2).
+    """
+    name = "q2"
+    fields = q2_fields
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.emoji_counter = Counter()
+
+    def update(self, tweet: dict) -> None:
+        text = tweet.get("content") or ""
+        self.emoji_counter.update(extract_emojis(text))
+
+    def merge(self, other: "EmojiAggregator") -> None:
+        self.emoji_counter.update(other.emoji_counter)
+
+    def result(self) -> List[Tuple[str, int]]:
+        return self.emoji_counter.most_common(self.top)
+
+
+class MentionAggregator(Aggregator):
+    """
+    Most mentioned users with their counts (q3).
+    """
+    name = "q3"
+    fields = q3_fields
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.user_mention_counter = Counter()
+
+    def update(self, tweet: dict) -> None:
+        text = tweet.get("content") or ""
+        self.user_mention_counter.update(extract_mentions(text))
+
+    def merge(self, other: "MentionAggregator") -> None:
+        self.user_mention_counter.update(other.user_mention_counter)
+
+    def result(self) -> List[Tuple[str, int]]:
+        return self.user_mention_counter.most_common(self.top)
+
+
+def default_aggregators(top: int = 10) -> List[Aggregator]:
+    """
+    Build one aggregator per question of the challenge.
+
+    Parameters:
+        top (int, optional): Number of items kept by every aggregator. Defaults to 10.
+    Returns:
+        List[Aggregator]: The q1, q2 and q3 aggregators.
+    """
+    return [TopDatesAggregator(top), EmojiAggregator(top), MentionAggregator(top)]
+
+
+def projection_for(aggregators: Sequence[Aggregator]) -> List[str]:
+    """
+    Union of the fields read by the given aggregators, in a stable order.
+
+    Parameters:
+        aggregators (Sequence[Aggregator]): Aggregators that will be fed by run_queries.
+    Returns:
+        List[str]: Dotted field paths to pass to the loaders as fields.
+    """
+    return list(dict.fromkeys(field for aggregator in aggregators for field in aggregator.fields))
+
+
+def run_queries(gcp_file: Iterable[dict], aggregators: Sequence[Aggregator]) -> Dict[str, dict]:
+    """
+    Answer several questions with a single scan of the tweets.
+
+    Every tweet is handed to each aggregator in turn, so the data is downloaded and parsed once
+    no matter how many questions are answered. The time spent inside each aggregator is measured
+    separately from the time spent producing the tweets (download and parsing).
+
+    Parameters:
+        gcp_file (Iterable[dict]): An iterable of dictionaries containing tweet data.
+        aggregators (Sequence[Aggregator]): Aggregators to feed, with unique names.
+    Returns:
+        Dict[str, dict]: For every aggregator name, its "result" and the "seconds" spent on it,
+        plus a "scan" entry with the number of "tweets" read and the "seconds" of the whole scan.
+    """
+    perf_counter = time.perf_counter
+    timings = [0.0] * len(aggregators)
+    updates = [aggregator.update for aggregator in aggregators]
+    tweets = 0
+
+    start_scan_time = perf_counter()
+    for tweet in gcp_file:
+        tweets += 1
+        for index, update in enumerate(updates):
+            start = perf_counter()
+            update(tweet)
+            timings[index] += perf_counter() - start
+
+    results = {}
+    for aggregator, seconds in zip(aggregators, timings):
+        start = perf_counter()
+        result = aggregator.result()
+        results[aggregator.name] = {"result": result, "seconds": seconds + perf_counter() - start}
+    results["scan"] = {"tweets": tweets, "seconds": perf_counter() - start_scan_time}
+
+    if instrumentation.is_enabled():
+        for aggregator in aggregators:
+            instrumentation.count(f"records.{aggregator.name}", tweets)
+            instrumentation.add_span(f"aggregate.{aggregator.name}", results[aggregator.name]["seconds"])
+        instrumentation.add_span("scan", results["scan"]["seconds"])
+
+    return results
+
+
+def main():
+    """
+    In this main function:
+    1. The tweet JSON is streamed once from a function that uses the Google Storage service,
+       projected to the fields needed by the three questions.
+    2. The stream is fed to the q1, q2 and q3 aggregators at the same time.
+    3. The answers are printed with the time spent in each aggregator and in the whole scan.
+    """
+    aggregators = default_aggregators()
+    results = run_queries(stream_json_from_gcs(fields=projection_for(aggregators)), aggregators)
+
+    for aggregator in aggregators:
+        print(
+            f"""
+    {aggregator.name}: {results[aggregator.name]['result']}
+    Total time in {aggregator.name} aggregator: {results[aggregator.name]['seconds']}, sec
+    """
+        )
+    print(f"Total time streaming and processing {results['scan']['tweets']} tweets: {results['scan']['seconds']}, sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import hashlib
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+from src.common.gcs.constants import cache_batch_size, cache_dir
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Fields of the tweets kept in the cache, as dotted paths accepted by the loaders.
+cached_fields = ['date', 'user.username', 'content', 'mentionedUsers']
+
+
+@lru_cache(maxsize=None)
+def cache_schema() -> "pa.Schema":
+    """
+    Arrow schema of the cache files. pyarrow is only imported when the cache is used.
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ('date', pa.string()),
+        ('username', pa.string()),
+        ('content', pa.string()),
+        ('mentioned_users', pa.list_(pa.string())),
+    ])
+
+
+def local_source_key(file_path: str) -> str:
+    """
+    Version of a local file, which changes whenever the file is rewritten or appended to.
+
+    Parameters:
+        file_path (str): Path of the source file.
+    Returns:
+        str: The size and modification time of the file.
+    """
+    stat = os.stat(file_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def gcs_source_key(blob) -> str:
+    """
+    Version of a GCS blob, which changes whenever the blob is overwritten.
+
+    Parameters:
+        blob (storage.Blob): Blob with its metadata loaded (see Blob.reload).
+    Returns:
+        str: The generation and etag of the blob.
+    """
+    return f"{blob.generation}-{blob.etag}"
+
+
+def cache_path(source: str, key: str, directory: str = cache_dir) -> str:
+    """
+    Path of the cache file of a given version of a source.
+
+    Parameters:
+        source (str): Identity of the source, e.g. its local path or gs:// URI.
+        key (str): Version of the source, see local_source_key and gcs_source_key.
+        directory (str, optional): Directory of the cache. Defaults to cache_dir.
+    Returns:
+        str: The path of the Arrow file, prefixed by a hash of the source so older versions can be found.
+    """
+    source_hash = hashlib.sha1(source.encode()).hexdigest()[:16]
+    key_hash = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{source_hash}-{key_hash}.arrow")
+
+
+def covers(fields: Optional[Iterable[str]]) -> bool:
+    """
+    Whether the cache holds every requested field.
+
+    Parameters:
+        fields (Iterable[str], optional): Dotted paths requested to a loader, None meaning every field.
+    Returns:
+        bool: True if the request can be answered from the cache.
+    """
+    return fields is not None and set(fields) <= set(cached_fields)
+
+
+def write_cache(tweets: Iterable[dict], path: str, batch_size: int = cache_batch_size) -> None:
+    """
+    Write the cached columns of a stream of tweets to an Arrow IPC file.
+
+    The tweets are written in record batches of batch_size rows, so the stream is never fully
+    resident. The file is written under a temporary name and renamed at the end, and older
+    versions of the same source are removed, so readers never see a partial cache.
+
+    Parameters:
+        tweets (Iterable[dict]): Tweets holding at least cached_fields, e.g. from stream_json_from_local.
+        path (str): Destination, see cache_path.
+        batch_size (int, optional): Number of rows per record batch. Defaults to cache_batch_size.
+    """
+    import pyarrow as pa
+
+    schema = cache_schema()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with pa.OSFile(temporary_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        columns = ([], [], [], [])
+        for tweet in tweets:
+            mentioned_users = tweet.get("mentionedUsers")
+            columns[0].append(tweet["date"])
+            columns[1].append(tweet["user"]["username"])
+            columns[2].append(tweet.get("content"))
+            columns[3].append([user["username"] for user in mentioned_users] if mentioned_users else None)
+            if len(columns[0]) == batch_size:
+                writer.write_batch(pa.record_batch(list(columns), schema=schema))
+                columns = ([], [], [], [])
+        if columns[0]:
+            writer.write_batch(pa.record_batch(list(columns), schema=schema))
+
+    prefix = os.path.basename(path).split("-")[0]
+    for name in os.listdir(os.path.dirname(path)):
+        if name.startswith(prefix) and name.endswith(".arrow"):
+            os.remove(os.path.join(os.path.dirname(path), name))
+    os.replace(temporary_path, path)
+
+
+def read_cache(path: str) -> "pa.Table":
+    """
+    Open a cache file through memory mapping.
+
+    The columns are not copied into the process: the table points at the pages of the file,
+    which the OS loads on demand and can share between runs.
+
+    Parameters:
+        path (str): Cache file, see cache_path.
+    Returns:
+        pa.Table: The cached columns, following cache_schema.
+    """
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def iter_cached_records(table: "pa.Table") -> Iterator[dict]:
+    """
+    Rebuild compact tweets from the cached columns, with the same nested shape as the JSON.
+
+    Parameters:
+        table (pa.Table): Table returned by read_cache.
+    Returns:
+        Iterator[dict]: One record per tweet with 'date', 'user.username', 'content' and 'mentionedUsers'.
+    """
+    for batch in table.to_batches():
+        dates, usernames, contents, mentioned_users = (column.to_pylist() for column in batch.columns)
+        for date, username, content, mentions in zip(dates, usernames, contents, mentioned_users):
+            yield {
+                "date": date,
+                "user": {"username": username},
+                "content": content,
+                "mentionedUsers": [{"username": mention} for mention in mentions] if mentions is not None else None,
+            }
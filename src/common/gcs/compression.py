@@ -0,0 +1,239 @@
+import io
+import itertools
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from src.common.gcs.constants import bgzf_batch_blocks, decompress_workers
+
+gzip_magic = b"\x1f\x8b"
+zstd_magic = b"\x28\xb5\x2f\xfd"
+# Bytes needed to tell a BGZF block from a plain gzip member: fixed header, XLEN and the BC subfield.
+header_size = 18
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """
+    Detect the compression of a file or blob from its first bytes.
+
+    bgzip files (BGZF) are multi-member gzip files where every member is a block of at most 64 KiB
+    holding its own compressed size in a 'BC' extra subfield, so they can be split without
+    decompressing them.
+
+    Parameters:
+        header (bytes): At least the first header_size bytes of the content, when it is that long.
+    Returns:
+        str: "bgzip", "gzip" or "zstd", or None for uncompressed content.
+    """
+    if header[:2] == gzip_magic:
+        return "bgzip" if _bgzf_block_size(header) is not None else "gzip"
+    if header[:4] == zstd_magic:
+        return "zstd"
+    return None
+
+
+def detect_file_compression(file_path: str) -> Optional[str]:
+    """
+    Same as detect_compression for a local file.
+    """
+    with open(file_path, 'rb') as file:
+        return detect_compression(file.read(header_size))
+
+
+def decompress_chunks(chunks: Iterable[bytes], workers: int = decompress_workers) -> Iterator[bytes]:
+    """
+    Detect the compression of a stream of raw chunks and decompress it on the fly.
+
+    Uncompressed content is passed through untouched, so every loader can wrap its chunks with
+    this function and keep feeding iter_lines and decode_lines as before.
+    - gzip, including multi-member gzip, is decompressed member after member with zlib. NUL
+      padding after the last member is ignored, and a truncated stream raises ValueError.
+    - bgzip is cut into its independent blocks, which are decompressed by a pool of threads in
+      batches of bgzf_batch_blocks blocks and yielded in order. Only the inflation is parallel:
+      the lines are still split and parsed by the consumer, in a single stream.
+    - zstd, including multi-frame zstd, is decompressed with the zstandard package.
+
+    Parameters:
+        chunks (Iterable[bytes]): Raw content in order, e.g. from iter_file_chunks or iter_blob_chunks.
+        workers (int, optional): Number of threads decompressing bgzip blocks. zlib releases the GIL
+            while it inflates, so the blocks are decompressed in parallel. Defaults to decompress_workers.
+    Returns:
+        Iterator[bytes]: The decompressed content, one chunk at a time.
+    Raises:
+        ValueError: If gzip or bgzip content is invalid, truncated or followed by something else than NUL padding.
+    """
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= header_size:
+            break
+    if not head:
+        return
+    compression = detect_compression(head)
+    stream = itertools.chain([head], chunks)
+
+    if compression is None:
+        yield from stream
+    elif compression == "bgzip" and workers > 1:
+        yield from _inflate_bgzf_parallel(iter_bgzf_blocks(stream), workers)
+    elif compression in ("gzip", "bgzip"):
+        yield from _inflate_gzip(stream)
+    else:
+        yield from _decompress_zstd(stream)
+
+
+def _check_padding(data: bytes) -> None:
+    if data.strip(b"\0"):
+        raise ValueError("Unexpected data after the NUL padding of a gzip stream")
+
+
+def _inflate_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(wbits=31)
+    started = False
+    # A member ended and the next one did not start yet: what follows is a member or padding.
+    ended = False
+    padding = False
+    for chunk in chunks:
+        if padding:
+            _check_padding(chunk)
+            continue
+        while chunk:
+            if ended and chunk[:1] == b"\0":
+                _check_padding(chunk)
+                padding = True
+                break
+            try:
+                data = decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise ValueError(f"Invalid gzip stream: {e}") from e
+            started, ended = True, False
+            if data:
+                yield data
+            if not decompressor.eof:
+                break
+            # End of a gzip member: the rest of the chunk, or the next chunk, starts the next one.
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(wbits=31)
+            started, ended = False, True
+    if started:
+        raise ValueError("Truncated gzip stream")
+
+
+def _bgzf_block_size(header: bytes) -> Optional[int]:
+    """
+    Total size of the BGZF block starting header, or None if it is not a BGZF block header.
+    """
+    if len(header) < 12 or header[:2] != gzip_magic or not header[3] & 4:
+        return None
+    extra_length = struct.unpack_from("<H", header, 10)[0]
+    position, extra_end = 12, 12 + extra_length
+    while position + 4 <= min(extra_end, len(header)):
+        subfield_id, subfield_length = header[position:position + 2], struct.unpack_from("<H", header, position + 2)[0]
+        if subfield_id == b"BC" and subfield_length == 2 and position + 6 <= len(header):
+            return struct.unpack_from("<H", header, position + 4)[0] + 1
+        position += 4 + subfield_length
+    return None
+
+
+def iter_bgzf_blocks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Cut a BGZF stream into its blocks, reading only the block headers.
+
+    Parameters:
+        chunks (Iterable[bytes]): Raw BGZF content in order, split anywhere.
+    Returns:
+        Iterator[bytes]: One complete gzip member per block.
+    Raises:
+        ValueError: If the content is not a sequence of BGZF blocks, optionally followed by NUL padding.
+    """
+    buffer = bytearray()
+    position = 0
+    padding = False
+    for chunk in chunks:
+        if padding:
+            _check_padding(chunk)
+            continue
+        buffer += chunk
+        if buffer[position:position + 1] == b"\0":
+            _check_padding(bytes(buffer[position:]))
+            padding = True
+            buffer.clear()
+            continue
+        while len(buffer) - position >= header_size:
+            block_size = _bgzf_block_size(bytes(buffer[position:position + header_size]))
+            if block_size is None:
+                raise ValueError(f"Invalid BGZF block header at offset {position}")
+            if len(buffer) - position < block_size:
+                break
+            yield bytes(buffer[position:position + block_size])
+            position += block_size
+            if buffer[position:position + 1] == b"\0":
+                _check_padding(bytes(buffer[position:]))
+                padding = True
+                position = len(buffer)
+                break
+        del buffer[:position]
+        position = 0
+    if buffer:
+        raise ValueError("Truncated BGZF stream")
+
+
+def _inflate_blocks(blocks: List[bytes]) -> bytes:
+    try:
+        return b"".join(zlib.decompress(block, wbits=31) for block in blocks)
+    except zlib.error as e:
+        raise ValueError(f"Invalid BGZF block: {e}") from e
+
+
+def _inflate_bgzf_parallel(blocks: Iterable[bytes], workers: int) -> Iterator[bytes]:
+    batches = iter(lambda: list(itertools.islice(blocks, bgzf_batch_blocks)), [])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(_inflate_blocks, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    Read-only file object over an iterable of chunks, for the streaming zstandard reader.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b""
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def _decompress_zstd(chunks: Iterable[bytes], read_size: int = 1024 * 1024) -> Iterator[bytes]:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compressed input requires the zstandard package") from e
+
+    reader = zstandard.ZstdDecompressor().stream_reader(_ChunkReader(chunks), read_across_frames=True)
+    with reader:
+        while True:
+            data = reader.read(read_size)
+            if not data:
+                break
+            yield data
@@ -1,6 +1,34 @@
+import os
+
 # GCS constants
 gcs_credentials_path = '/Users/mema/Downloads/sapient-flight-417202-d296d0b8294a.json'
 gcs_bucket_name = 'tweet_latam_challenge'
 gcs_blob_name = 'farmers-protest-tweets-2021-2-4.json'
 # JSON file local path
 json_file_local_path = '/Users/mema/Downloads/farmers-protest-tweets-2021-2-4.json'
+# Streaming constants
+stream_chunk_size = 8 * 1024 * 1024
+gcs_download_workers = 8
+# Field projections needed by each question
+q1_fields = ['date', 'user.username']
+q2_fields = ['content']
+q3_fields = ['content']
+# Compressed input constants
+decompress_workers = 4
+bgzf_batch_blocks = 64
+# Resilient parsing constants
+max_parse_errors = 1000
+max_parse_error_rate = 0.01
+parse_error_rate_min_lines = 10000
+# Out-of-core constants
+dask_blocksize = 64 * 1024 * 1024
+# Columnar cache constants
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'latam_challenge')
+cache_batch_size = 64 * 1024
+# Pipeline constants
+pipeline_queue_size = 8
+# Query service constants
+service_host = '127.0.0.1'
+service_port = 8080
+query_cache_size = 256
+source_check_interval = 5.0
@@ -1,38 +1,759 @@
-import json
-from typing import List
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import orjson as orjson
-from google.cloud import storage
 
-from src.common.gcs.constants import gcs_credentials_path, gcs_bucket_name, gcs_blob_name, json_file_local_path
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.gcs.cache import (
+    cache_path,
+    cached_fields,
+    covers,
+    gcs_source_key,
+    iter_cached_records,
+    local_source_key,
+    read_cache,
+    write_cache,
+)
+from src.common.gcs.compression import decompress_chunks, detect_compression, detect_file_compression, header_size
+from src.common.gcs.constants import (
+    gcs_credentials_path,
+    gcs_bucket_name,
+    gcs_blob_name,
+    gcs_download_workers,
+    json_file_local_path,
+    stream_chunk_size,
+)
+from src.common.gcs.parse_errors import ErrorBudgetExceeded, ParseErrorPolicy
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from google.cloud import storage
 
-def load_json_from_gcs() -> List[dict]:
+# Fields stored by a TweetBatch.
+batch_fields = ['date', 'user.username', 'content']
+
+
+@lru_cache(maxsize=None)
+def get_storage_client() -> "storage.Client":
+    """
+    Get the storage client shared by every loader of the process.
+
+    The client is created once, so its authorized session and connection pool are reused by
+    every request. When the STORAGE_EMULATOR_HOST environment variable points at a local fake
+    GCS server, the client connects to it anonymously instead of using the service account.
+    The Google Cloud client libraries are imported here, so the local loaders do not pay for them.
+    Returns:
+        storage.Client: The shared client.
+    """
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+
+    if os.environ.get("STORAGE_EMULATOR_HOST"):
+        return storage.Client(project="emulator", credentials=AnonymousCredentials())
+    return storage.Client.from_service_account_json(gcs_credentials_path)
+
+
+def gcs_blob() -> "storage.Blob":
+    """
+    Get the blob of the tweet dump, authenticated with the service account of the constants.
+    Returns:
+        storage.Blob: The gcs_blob_name blob of the gcs_bucket_name bucket.
+    """
+    bucket = get_storage_client().bucket(gcs_bucket_name)
+    return bucket.blob(gcs_blob_name)
+
+
+@instrumentation.instrumented("load_json_from_gcs")
+def load_json_from_gcs(
+        fields: Optional[Sequence[str]] = None,
+        use_cache: bool = False,
+        errors: Optional[ParseErrorPolicy] = None
+) -> List[dict]:
     """
     Load JSON data from Google Cloud Storage.
+
+    The blob is downloaded in concurrent byte-range requests, and the lines of every chunk are
+    parsed while the following chunks are still being downloaded. gzip, bgzip and zstd blobs are
+    decompressed on the fly, see decompress_chunks.
+    Parameters:
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+            Defaults to None, which keeps every field.
+        use_cache (bool, optional): Read the columnar cache instead of parsing the JSON when the
+            fields are covered by it, see load_table_from_gcs. Defaults to False.
+        errors (ParseErrorPolicy, optional): Skip the malformed lines as the policy says instead of
+            failing on the first one, see stream_json_from_gcs. Defaults to None.
     Returns:
         list: List of JSON objects loaded from the specified GCS blob.
+    Raises:
+        ErrorBudgetExceeded: If errors is given and the malformed lines exceed its budget.
     """
+    if use_cache and covers(fields):
+        return list(iter_cached_records(load_table_from_gcs()))
+
     print("Loading JSON from Google Cloud Storage")
-    storage_client = storage.Client.from_service_account_json(gcs_credentials_path)
-    bucket = storage_client.bucket(gcs_bucket_name)
-    blob = bucket.blob(gcs_blob_name)
+    blob = gcs_blob()
 
     try:
-        content = blob.download_as_text()
-        return [orjson.loads(line) for line in content.splitlines()]
+        if errors is not None:
+            return list(stream_json_from_gcs(fields=fields, errors=errors))
+        chunks = decompress_chunks(iter_blob_chunks(blob, workers=gcs_download_workers))
+        return list(decode_lines(iter_lines(chunks), fields))
+    except ErrorBudgetExceeded:
+        raise
     except Exception as e:
+        instrumentation.record_error("load_json_from_gcs", e)
         print(f"Error processing the file: {e}")
 
 
-def load_json_from_local() -> List[dict]:
+@instrumentation.instrumented("load_json_from_local")
+def load_json_from_local(
+        fields: Optional[Sequence[str]] = None,
+        use_cache: bool = False,
+        file_path: str = json_file_local_path,
+        errors: Optional[ParseErrorPolicy] = None
+) -> List[dict]:
     """
     Load JSON data from local file.
+
+    The file is memory mapped and every line is handed to orjson as a slice of the mapping,
+    without decoding it into an intermediate str, see iter_local_lines.
+    Parameters:
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+            Defaults to None, which keeps every field.
+        use_cache (bool, optional): Read the columnar cache instead of parsing the JSON when the
+            fields are covered by it, see load_table_from_local. Defaults to False.
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        errors (ParseErrorPolicy, optional): Skip the malformed lines as the policy says instead of
+            failing on the first one, see stream_json_from_local. Defaults to None.
     Returns:
         list: List of JSON objects loaded from the specified local file.
+    Raises:
+        ErrorBudgetExceeded: If errors is given and the malformed lines exceed its budget.
+    """
+    if use_cache and covers(fields):
+        return list(iter_cached_records(load_table_from_local(file_path)))
+
+    if errors is not None:
+        return list(stream_json_from_local(file_path, fields=fields, errors=errors))
+    return list(decode_lines(iter_local_lines(file_path), fields))
+
+
+def compile_projection(fields: Sequence[str]) -> List[Tuple[str, ...]]:
+    """
+    Split dotted field names into key paths once, so they are not split again for every record.
+
+    Parameters:
+        fields (Sequence[str]): Dotted paths of the fields to keep, e.g. ["date", "user.username"].
+    Returns:
+        List[Tuple[str, ...]]: One tuple of keys per field.
+    """
+    return [tuple(field.split('.')) for field in fields]
+
+
+def project_record(record: dict, paths: List[Tuple[str, ...]]) -> dict:
+    """
+    Keep only the requested fields of a tweet, preserving its nested shape.
+
+    The result can be passed to the q functions in place of the full tweet, since
+    e.g. tweet["user"]["username"] still resolves, while the discarded nested objects
+    (quotedTweet, media, the rest of user, ...) are released right after decoding.
+    Missing or null parents produce None leaves.
+
+    Parameters:
+        record (dict): A decoded tweet.
+        paths (List[Tuple[str, ...]]): Key paths returned by compile_projection.
+    Returns:
+        dict: A compact record containing only the requested fields.
+    """
+    projected = {}
+    for path in paths:
+        source, target = record, projected
+        for key in path[:-1]:
+            source = source.get(key) or {}
+            target = target.setdefault(key, {})
+        target[path[-1]] = source.get(path[-1])
+    return projected
+
+
+def records_to_columns(records: Iterable[dict], fields: Sequence[str]) -> Dict[str, list]:
+    """
+    Collect the requested fields of a stream of tweets into one list per field.
+
+    Parameters:
+        records (Iterable[dict]): Decoded tweets, e.g. from stream_json_from_local.
+        fields (Sequence[str]): Dotted paths of the fields to collect.
+    Returns:
+        Dict[str, list]: Column values keyed by the dotted field name.
+    """
+    paths = compile_projection(fields)
+    columns = {field: [] for field in fields}
+    appends = [columns[field].append for field in fields]
+    for record in records:
+        for path, append in zip(paths, appends):
+            value = record
+            for key in path:
+                value = value.get(key) if value else None
+            append(value)
+    return columns
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Split a stream of raw byte chunks into complete NDJSON lines.
+
+    A chunk boundary can fall in the middle of a line, so the trailing partial line of each
+    chunk is carried over and joined with the next one. Blank lines are skipped.
+
+    Parameters:
+        chunks (Iterable[bytes]): Raw byte chunks in file order.
+    Returns:
+        Iterator[bytes]: One item per non-empty line, without the line terminator.
+    """
+    remainder = b""
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if remainder.strip():
+        yield remainder
+
+
+class LineOffsets:
+    """
+    Split a stream of raw byte chunks into non-empty lines like iter_lines, locating them on demand.
+
+    Iterating yields the lines of every chunk in order. Only the offset of the current chunk and
+    the number of lines before it are tracked, so the lines pay nothing for the bookkeeping: the
+    line number and byte offset of a line are computed by locate, e.g. when it fails to parse.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], start: int = 0):
+        """
+        Parameters:
+            chunks (Iterable[bytes]): Raw byte chunks in file order.
+            start (int, optional): Offset of the first byte of the first chunk. Defaults to 0.
+        """
+        self.chunks = chunks
+        self.start = start
+        self._lines_before = 0
+        self._raw: List[bytes] = []
+        self._lines: List[bytes] = []
+        self._position = start
+        self._cursor = (0, 0)
+
+    def __iter__(self) -> Iterator[bytes]:
+        remainder = b""
+        position = self.start
+        for chunk in self.chunks:
+            buffer = remainder + chunk
+            raw = buffer.split(b"\n")
+            remainder = raw.pop()
+            self._set_chunk(raw, position)
+            position += len(buffer) - len(remainder)
+            yield from self._lines
+        self._set_chunk([remainder], position)
+        yield from self._lines
+
+    def _set_chunk(self, raw: List[bytes], position: int) -> None:
+        self._lines_before += len(self._lines)
+        self._raw, self._position, self._cursor = raw, position, (0, 0)
+        self._lines = [line for line in raw if line.strip()]
+
+    @property
+    def count(self) -> int:
+        """
+        Number of non-empty lines of the chunks read so far.
+        """
+        return self._lines_before + len(self._lines)
+
+    def locate(self, line: bytes) -> Tuple[int, int]:
+        """
+        Locate a line of the current chunk, later than the last line located.
+
+        Parameters:
+            line (bytes): A line just yielded by the iteration.
+        Returns:
+            Tuple[int, int]: The 1-based line number among the non-empty lines, and the byte offset of the line.
+        """
+        line_index, raw_index = self._cursor
+        while self._lines[line_index] is not line:
+            line_index += 1
+        while self._raw[raw_index] is not line:
+            raw_index += 1
+        self._cursor = (line_index + 1, raw_index + 1)
+        offset = self._position + sum(len(raw_line) + 1 for raw_line in self._raw[:raw_index])
+        return self._lines_before + line_index + 1, offset
+
+
+def skip_bytes(chunks: Iterable[bytes], count: int) -> Iterator[bytes]:
+    """
+    Drop the first count bytes of a stream of chunks.
+    """
+    for chunk in chunks:
+        if count >= len(chunk):
+            count -= len(chunk)
+            continue
+        yield chunk[count:] if count else chunk
+        count = 0
+
+
+def iter_content_from(read_chunks: Callable[[int], Iterable[bytes]], header: bytes, start: int = 0) -> Iterator[bytes]:
+    """
+    Decompressed content of a source from the offset start, e.g. to resume a run.
+
+    Offsets are counted in the decompressed content. Uncompressed sources are read from start
+    directly; compressed ones are decompressed from the beginning and the first bytes dropped.
+
+    Parameters:
+        read_chunks (Callable[[int], Iterable[bytes]]): Reads the raw source from a byte offset,
+            e.g. iter_file_chunks or iter_blob_chunks.
+        header (bytes): First header_size bytes of the raw source, used when start is not 0.
+        start (int, optional): Offset of the first byte wanted. Defaults to 0.
+    Returns:
+        Iterator[bytes]: The content from start, one chunk at a time.
+    """
+    if start == 0:
+        return decompress_chunks(read_chunks(0))
+    if detect_compression(header) is None:
+        return iter(read_chunks(start))
+    return skip_bytes(decompress_chunks(read_chunks(0)), start)
+
+
+def iter_ranges_parallel(
+        fetch: Callable[[int, int], bytes],
+        size: int,
+        chunk_size: int = stream_chunk_size,
+        workers: int = gcs_download_workers,
+        start: int = 0
+) -> Iterator[bytes]:
+    """
+    Fetch consecutive byte ranges concurrently and yield them in order.
+
+    Up to 2 * workers ranges are requested ahead of the one being consumed, so the consumer
+    (e.g. the parser) works on a chunk while the following ones are downloading, and memory is
+    bounded by the window instead of the size of the source.
+
+    Parameters:
+        fetch (Callable[[int, int], bytes]): Returns the bytes of the range [start, end), e.g. a
+            ranged blob download or a read of a local file standing in for GCS.
+        size (int): Total size of the source in bytes.
+        chunk_size (int, optional): Size in bytes of each range.
+        workers (int, optional): Number of concurrent fetches. Defaults to gcs_download_workers.
+        start (int, optional): Offset of the first byte to fetch. Defaults to 0.
+    Returns:
+        Iterator[bytes]: The content of the source, one range at a time.
+    """
+    ranges = ((offset, min(offset + chunk_size, size)) for offset in range(start, size, chunk_size))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for range_start, range_end in ranges:
+            pending.append(executor.submit(fetch, range_start, range_end))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_blob_chunks(
+        blob: "storage.Blob",
+        chunk_size: int = stream_chunk_size,
+        workers: int = 1,
+        start: int = 0
+) -> Iterator[bytes]:
+    """
+    Read a GCS blob as a sequence of byte-range requests.
+
+    Every request is pinned to the generation of the blob when the read starts, so if the blob is
+    overwritten during the read, the download fails instead of mixing ranges of both versions.
+
+    Parameters:
+        blob (storage.Blob): Blob to read.
+        chunk_size (int, optional): Size in bytes of each ranged request.
+        workers (int, optional): Number of concurrent requests, see iter_ranges_parallel. Defaults to 1.
+        start (int, optional): Offset of the first byte to read. Defaults to 0.
+    Returns:
+        Iterator[bytes]: The blob content, one chunk at a time.
+    """
+    def download(range_start: int, range_end: int) -> bytes:
+        with instrumentation.span("gcs.download"):
+            data = blob.download_as_bytes(start=range_start, end=range_end - 1, if_generation_match=generation)
+        instrumentation.count("gcs.requests")
+        instrumentation.count("gcs.bytes_downloaded", len(data))
+        return data
+
+    blob.reload()
+    generation = blob.generation
+    if workers > 1:
+        yield from iter_ranges_parallel(download, blob.size, chunk_size, workers, start)
+        return
+    for offset in range(start, blob.size, chunk_size):
+        yield download(offset, min(offset + chunk_size, blob.size))
+
+
+# Bytes removed by bytes.strip().
+ascii_whitespace = frozenset(b" \t\n\r\x0b\x0c")
+
+
+def iter_mmap_lines(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[memoryview]:
+    """
+    Split a memory mapped file, or the byte range [start, end) of it, into NDJSON lines.
+
+    Line boundaries are searched on the raw bytes of the mapping and every line is yielded as a
+    memoryview over it, so no bytes are copied and the OS pages the file in on demand. The views
+    are only valid until the next line is requested: decode them right away, as decode_lines does.
+    start must be at the beginning of a line, e.g. a boundary returned by shard_file.
+
+    Parameters:
+        file_path (str): Path of the file to read.
+        start (int, optional): Offset of the first byte to read. Defaults to 0.
+        end (int, optional): Offset right after the last byte to read. Defaults to None, the end of the file.
+    Returns:
+        Iterator[memoryview]: One view per non-empty line, without the line terminator.
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return
+        instrumentation.count("local.bytes_mapped", end - start)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            view = memoryview(mapping)
+            try:
+                position = start
+                while position < end:
+                    newline = mapping.find(b"\n", position, end)
+                    line_end = end if newline == -1 else newline
+                    # Same rule as iter_lines (line.strip()), copying the line only if it starts with whitespace.
+                    if line_end > position and (
+                            mapping[position] not in ascii_whitespace or mapping[position:line_end].strip()
+                    ):
+                        line = view[position:line_end]
+                        try:
+                            yield line
+                        finally:
+                            # Also when the consumer stops early, or the mapping cannot be closed.
+                            line.release()
+                    position = line_end + 1
+            finally:
+                view.release()
+
+
+def iter_file_chunks(
+        file_path: str,
+        chunk_size: int = stream_chunk_size,
+        start: int = 0,
+        end: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Read a local file, or the byte range [start, end) of it, as a sequence of buffered binary reads.
+
+    Parameters:
+        file_path (str): Path of the file to read.
+        chunk_size (int, optional): Size in bytes of each read.
+        start (int, optional): Offset of the first byte to read. Defaults to 0.
+        end (int, optional): Offset right after the last byte to read. Defaults to None, the end of the file.
+    Returns:
+        Iterator[bytes]: The file content, one chunk at a time.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start if end is not None else None
+        while remaining is None or remaining > 0:
+            chunk = file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            instrumentation.count("local.bytes_read", len(chunk))
+            yield chunk
+
+
+def iter_local_lines(file_path: str) -> Iterator[bytes]:
+    """
+    Split a local NDJSON file into lines, decompressing it first if it is compressed.
+
+    Uncompressed files are memory mapped, see iter_mmap_lines. gzip, bgzip and zstd files are
+    read in chunks and decompressed on the fly, see decompress_chunks.
+
+    Parameters:
+        file_path (str): Path of the file to read.
+    Returns:
+        Iterator[bytes]: One item per non-empty line, without the line terminator.
+    """
+    if detect_file_compression(file_path) is None:
+        return iter_mmap_lines(file_path)
+    return iter_lines(decompress_chunks(iter_file_chunks(file_path)))
+
+
+def stream_json_from_gcs(
+        chunk_size: int = stream_chunk_size,
+        fields: Optional[Sequence[str]] = None,
+        use_cache: bool = False,
+        workers: int = gcs_download_workers,
+        errors: Optional[ParseErrorPolicy] = None,
+        start: int = 0
+) -> Iterator[dict]:
+    """
+    Stream JSON records from Google Cloud Storage.
+
+    Unlike load_json_from_gcs, each record is parsed and yielded as soon as its line is complete,
+    so only the chunks of the download window and one record are resident at a time regardless
+    of the blob size. gzip, bgzip and zstd blobs are decompressed on the fly, see decompress_chunks.
+
+    Parameters:
+        chunk_size (int, optional): Size in bytes of each ranged request.
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+            Defaults to None, which keeps every field.
+        use_cache (bool, optional): Read the columnar cache instead of parsing the JSON when the
+            fields are covered by it, see load_table_from_gcs. Defaults to False.
+        workers (int, optional): Number of concurrent ranged requests. Defaults to gcs_download_workers.
+        errors (ParseErrorPolicy, optional): Skip the malformed lines as the policy says instead of
+            failing on the first one. Defaults to None.
+        start (int, optional): Offset of the line to start from, e.g. the offset of an
+            ErrorBudgetExceeded to resume a run. Defaults to 0.
+    Returns:
+        Iterator[dict]: JSON objects loaded from the specified GCS blob, one at a time.
+    Raises:
+        ErrorBudgetExceeded: If errors is given and the malformed lines exceed its budget.
+    """
+    if use_cache and covers(fields):
+        yield from iter_cached_records(load_table_from_gcs())
+        return
+
+    print("Streaming JSON from Google Cloud Storage")
+    blob = gcs_blob()
+    header = b""
+    if start:
+        blob.reload()
+        header = blob.download_as_bytes(start=0, end=header_size - 1, if_generation_match=blob.generation)
+    chunks = iter_content_from(
+        lambda offset: iter_blob_chunks(blob, chunk_size, workers, start=offset), header, start
+    )
+    yield from _decode_chunks(chunks, fields, errors, start)
+
+
+def stream_json_from_local(
+        file_path: str = json_file_local_path,
+        chunk_size: int = stream_chunk_size,
+        fields: Optional[Sequence[str]] = None,
+        use_cache: bool = False,
+        errors: Optional[ParseErrorPolicy] = None,
+        start: int = 0
+) -> Iterator[dict]:
+    """
+    Stream JSON records from a local file.
+
+    gzip, bgzip and zstd files are decompressed on the fly, see decompress_chunks.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        chunk_size (int, optional): Size in bytes of each buffered read.
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+            Defaults to None, which keeps every field.
+        use_cache (bool, optional): Read the columnar cache instead of parsing the JSON when the
+            fields are covered by it, see load_table_from_local. Defaults to False.
+        errors (ParseErrorPolicy, optional): Skip the malformed lines as the policy says instead of
+            failing on the first one. Defaults to None.
+        start (int, optional): Offset of the line to start from, e.g. the offset of an
+            ErrorBudgetExceeded to resume a run. Defaults to 0.
+    Returns:
+        Iterator[dict]: JSON objects loaded from the specified local file, one at a time.
+    Raises:
+        ErrorBudgetExceeded: If errors is given and the malformed lines exceed its budget.
+    """
+    if use_cache and covers(fields):
+        yield from iter_cached_records(load_table_from_local(file_path))
+        return
+
+    with open(file_path, 'rb') as file:
+        header = file.read(header_size)
+    chunks = iter_content_from(lambda offset: iter_file_chunks(file_path, chunk_size, start=offset), header, start)
+    yield from _decode_chunks(chunks, fields, errors, start)
+
+
+def _decode_chunks(
+        chunks: Iterable[bytes],
+        fields: Optional[Sequence[str]],
+        errors: Optional[ParseErrorPolicy],
+        start: int
+) -> Iterator[dict]:
+    if errors is None:
+        return decode_lines(iter_lines(chunks), fields)
+    return decode_lines_resilient(chunks, fields, errors, start)
+
+
+def decode_lines(lines: Iterable[bytes], fields: Optional[Sequence[str]] = None) -> Iterator[dict]:
+    """
+    Parse NDJSON lines into tweets, optionally projecting them.
+
+    Parameters:
+        lines (Iterable[bytes]): Raw lines as bytes or memoryview, e.g. from iter_lines or iter_mmap_lines.
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+            Defaults to None, which keeps every field.
+    Returns:
+        Iterator[dict]: One decoded tweet per line.
+    """
+    if instrumentation.is_enabled():
+        yield from _decode_lines_instrumented(lines, fields)
+        return
+
+    if fields is None:
+        for line in lines:
+            yield orjson.loads(line)
+    else:
+        paths = compile_projection(fields)
+        for line in lines:
+            yield project_record(orjson.loads(line), paths)
+
+
+def _decode_lines_instrumented(lines: Iterable[bytes], fields: Optional[Sequence[str]]) -> Iterator[dict]:
+    """
+    decode_lines that also counts the lines parsed, the time spent parsing them and the parse errors.
+    """
+    paths = None if fields is None else compile_projection(fields)
+    perf_counter = time.perf_counter
+    parsed = 0
+    seconds = 0.0
+    try:
+        for line in lines:
+            start = perf_counter()
+            try:
+                tweet = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                instrumentation.count("parse_errors")
+                raise
+            if paths is not None:
+                tweet = project_record(tweet, paths)
+            seconds += perf_counter() - start
+            parsed += 1
+            yield tweet
+    finally:
+        instrumentation.count("lines_parsed", parsed)
+        instrumentation.add_span("parse", seconds)
+
+
+def decode_lines_resilient(
+        chunks: Iterable[bytes],
+        fields: Optional[Sequence[str]],
+        errors: ParseErrorPolicy,
+        start: int = 0
+) -> Iterator[dict]:
+    """
+    Parse NDJSON chunks into tweets like decode_lines, handing the malformed lines to a policy.
+
+    Lines that are not valid JSON objects are given to errors, with their line number and byte
+    offset, and errors counts them, writes them to its dead-letter file and raises
+    ErrorBudgetExceeded when they exceed its budget. The valid lines go through the same loop as
+    decode_lines plus a type check: the loop is only left, and the line located (see
+    LineOffsets), when a line fails.
+
+    Parameters:
+        chunks (Iterable[bytes]): Raw content in order, e.g. from iter_file_chunks.
+        fields (Sequence[str], optional): Dotted paths of the fields to keep, see project_record.
+        errors (ParseErrorPolicy): What to do with the malformed lines.
+        start (int, optional): Offset of the first byte of the first chunk. Defaults to 0.
+    Returns:
+        Iterator[dict]: One decoded tweet per valid line.
+    Raises:
+        ErrorBudgetExceeded: If the malformed lines exceed the budget of errors.
+    """
+    paths = None if fields is None else compile_projection(fields)
+    lines = LineOffsets(chunks, start)
+    iterator = iter(lines)
+    line = b""
+    try:
+        while True:
+            try:
+                if paths is None:
+                    for line in iterator:
+                        tweet = orjson.loads(line)
+                        if type(tweet) is not dict:
+                            raise orjson.JSONDecodeError("Not a JSON object", line.decode(errors="replace"), 0)
+                        yield tweet
+                else:
+                    for line in iterator:
+                        tweet = orjson.loads(line)
+                        if type(tweet) is not dict:
+                            raise orjson.JSONDecodeError("Not a JSON object", line.decode(errors="replace"), 0)
+                        yield project_record(tweet, paths)
+                break
+            except orjson.JSONDecodeError as e:
+                line_number, offset = lines.locate(line)
+                errors.record(line, line_number, offset, e)
+        errors.finish(lines.count)
+    finally:
+        errors.close()
+
+
+@instrumentation.instrumented("load_table_from_gcs")
+def load_table_from_gcs() -> "pa.Table":
+    """
+    Load the columnar cache of the GCS blob, building it first if it is missing or stale.
+
+    The cache is keyed by the generation and etag of the blob, so it is rebuilt only when the
+    blob is overwritten. Building it streams the blob once; later runs skip JSON parsing and
+    map the cached columns into memory.
+
+    Returns:
+        pa.Table: The cached columns (date, username, content, mentioned_users) of the blob.
+    """
+    blob = gcs_blob()
+    blob.reload()
+    path = cache_path(f"gs://{gcs_bucket_name}/{gcs_blob_name}", gcs_source_key(blob))
+    if not os.path.exists(path):
+        print("Building the columnar cache from Google Cloud Storage")
+        chunks = decompress_chunks(iter_blob_chunks(blob, workers=gcs_download_workers))
+        write_cache(decode_lines(iter_lines(chunks), cached_fields), path)
+    return read_cache(path)
+
+
+@instrumentation.instrumented("load_table_from_local")
+def load_table_from_local(file_path: str = json_file_local_path) -> "pa.Table":
+    """
+    Load the columnar cache of a local file, building it first if it is missing or stale.
+
+    The cache is keyed by the size and modification time of the file, so it is rebuilt only
+    when the file changes.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+    Returns:
+        pa.Table: The cached columns (date, username, content, mentioned_users) of the file.
+    """
+    path = cache_path(os.path.abspath(file_path), local_source_key(file_path))
+    if not os.path.exists(path):
+        print("Building the columnar cache")
+        write_cache(stream_json_from_local(file_path, fields=cached_fields), path)
+    return read_cache(path)
+
+
+@instrumentation.instrumented("load_batch_from_gcs")
+def load_batch_from_gcs() -> TweetBatch:
+    """
+    Load the fields of q1, q2 and q3 from Google Cloud Storage into a compact TweetBatch.
+
+    Returns:
+        TweetBatch: The tweets of the GCS blob.
+    """
+    return TweetBatch.from_tweets(stream_json_from_gcs(fields=batch_fields))
+
+
+@instrumentation.instrumented("load_batch_from_local")
+def load_batch_from_local(file_path: str = json_file_local_path) -> TweetBatch:
+    """
+    Load the fields of q1, q2 and q3 from a local file into a compact TweetBatch.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+    Returns:
+        TweetBatch: The tweets of the file.
     """
-    gcp_file = []
-    with open(json_file_local_path, 'r') as file:
-        for line in file:
-            gcp_file.append(json.loads(line))
-    return gcp_file
+    return TweetBatch.from_tweets(decode_lines(iter_local_lines(file_path), batch_fields))
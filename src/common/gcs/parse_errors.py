@@ -0,0 +1,142 @@
+from typing import Optional
+
+import orjson
+
+from src.common import instrumentation
+from src.common.gcs.constants import max_parse_error_rate, max_parse_errors, parse_error_rate_min_lines
+
+
+class ErrorBudgetExceeded(ValueError):
+    """
+    Raised when a resilient parse finds more malformed lines than its ParseErrorPolicy allows.
+
+    offset is the byte offset of the line that exhausted the budget, where a run can resume once
+    the line is fixed; next_offset is the offset of the following line, to resume skipping it.
+    Both are None when the source does not know the offsets of its lines.
+    """
+
+    def __init__(self, message: str, errors: int, line_number: int, offset: Optional[int], next_offset: Optional[int]):
+        super().__init__(message)
+        self.errors = errors
+        self.line_number = line_number
+        self.offset = offset
+        self.next_offset = next_offset
+
+
+class ParseErrorPolicy:
+    """
+    What a resilient parse does with the lines orjson cannot decode.
+
+    Malformed lines are skipped and counted. When dead_letter_path is given, every one of them is
+    appended to that file as a JSON object with its "line_number", "offset", "error" and raw
+    "line", so it can be inspected and replayed later. The run fails with ErrorBudgetExceeded, at
+    the malformed line that exhausts the budget, when the number of errors exceeds max_errors, or
+    when the share of malformed lines exceeds max_error_rate once at least min_lines lines were
+    read. A run that ends over max_error_rate without such a line is kept and only warned about.
+    """
+
+    def __init__(
+            self,
+            max_errors: Optional[int] = max_parse_errors,
+            max_error_rate: Optional[float] = max_parse_error_rate,
+            dead_letter_path: Optional[str] = None,
+            min_lines: int = parse_error_rate_min_lines
+    ):
+        """
+        Parameters:
+            max_errors (int, optional): Malformed lines tolerated. None means no limit. Defaults to max_parse_errors.
+            max_error_rate (float, optional): Share of malformed lines tolerated. None means no limit.
+                Defaults to max_parse_error_rate.
+            dead_letter_path (str, optional): JSON lines file receiving the malformed lines. Defaults to None.
+            min_lines (int, optional): Lines read before max_error_rate is enforced. Defaults to parse_error_rate_min_lines.
+        """
+        self.max_errors = max_errors
+        self.max_error_rate = max_error_rate
+        self.dead_letter_path = dead_letter_path
+        self.min_lines = min_lines
+        self.errors = 0
+        self.lines = 0
+        self.first_error_offset: Optional[int] = None
+        # Kept so the caller can resume even when the q functions catch the exception.
+        self.exceeded: Optional[ErrorBudgetExceeded] = None
+        self._dead_letter = None
+
+    def record(self, line: bytes, line_number: int, offset: Optional[int], error: Exception) -> None:
+        """
+        Account for a malformed line, then enforce the budget.
+
+        Parameters:
+            line (bytes): The raw line.
+            line_number (int): 1-based position of the line among the non-empty lines read.
+            offset (int, optional): Byte offset of the line in the source, if known.
+            error (Exception): The decoding error.
+        Raises:
+            ErrorBudgetExceeded: If the line exhausts the budget.
+        """
+        self.errors += 1
+        self.lines = max(self.lines, line_number)
+        if self.first_error_offset is None:
+            self.first_error_offset = offset
+        instrumentation.count("parse_errors")
+
+        if self.dead_letter_path:
+            if self._dead_letter is None:
+                self._dead_letter = open(self.dead_letter_path, 'ab')
+            self._dead_letter.write(orjson.dumps({
+                "line_number": line_number,
+                "offset": offset,
+                "error": str(error),
+                "line": bytes(line).decode(errors="replace"),
+            }) + b"\n")
+            self._dead_letter.flush()
+
+        next_offset = None if offset is None else offset + len(line) + 1
+        self.check(line_number, offset, next_offset)
+
+    def check(self, line_number: int, offset: Optional[int] = None, next_offset: Optional[int] = None) -> None:
+        """
+        Raise ErrorBudgetExceeded if the errors found in the first line_number lines exceed the budget.
+        """
+        if self.max_errors is not None and self.errors > self.max_errors:
+            reason = f"{self.errors} malformed lines, more than the {self.max_errors} allowed"
+        elif (
+                self.max_error_rate is not None
+                and line_number >= self.min_lines
+                and self.errors > self.max_error_rate * line_number
+        ):
+            reason = f"{self.errors} malformed lines out of {line_number}, more than {self.max_error_rate:.2%}"
+        else:
+            return
+        self.exceeded = ErrorBudgetExceeded(
+            f"Error budget exceeded at line {line_number} (offset {offset}): {reason}",
+            self.errors,
+            line_number,
+            offset,
+            next_offset,
+        )
+        raise self.exceeded
+
+    def finish(self, lines: int) -> None:
+        """
+        Close the dead-letter file and warn if the malformed lines exceed max_error_rate over the whole input.
+
+        Parameters:
+            lines (int): Number of non-empty lines read.
+        """
+        self.lines = lines
+        self.close()
+        if self.max_error_rate is not None and self.errors > self.max_error_rate * lines:
+            print(f"Warning: {self.errors} malformed lines out of {lines}, more than {self.max_error_rate:.2%}")
+
+    def close(self) -> None:
+        if self._dead_letter is not None:
+            self._dead_letter.close()
+            self._dead_letter = None
+
+    def summary(self) -> dict:
+        return {
+            "lines": self.lines,
+            "errors": self.errors,
+            "first_error_offset": self.first_error_offset,
+            "resume_offset": None if self.exceeded is None else self.exceeded.next_offset,
+        }
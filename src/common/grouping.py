@@ -0,0 +1,126 @@
+import heapq
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Hashable, Iterable, List, Mapping, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# (group, [(item, count), ...]) for every top group, best group first.
+GroupedTop = List[Tuple[Hashable, List[Tuple[Hashable, int]]]]
+
+
+def top_k_by_group(
+        records: Iterable[dict],
+        group_key: Callable[[dict], Hashable],
+        item_key: Callable[[dict], Hashable],
+        k_groups: int = 10,
+        k_items: int = 1,
+        explode: bool = False
+) -> GroupedTop:
+    """
+    Find the top groups by number of items and the top items within each of them, in one pass.
+
+    This function performs the following steps:
+    1. Iterate through the records once, counting the occurrences of every (group, item) pair.
+    2. Rank the groups by the sum of their pair counts and keep the top k_groups with a heap.
+    3. Collect the pairs of those groups and keep the top k_items of every group with a partial sort.
+
+    Ties are broken deterministically, as in q1: between groups with the same count the group that
+    sorts first ranks first, and between items with the same count the item that sorts first wins.
+    Memory is bounded by the number of distinct pairs, so records can be a stream.
+
+    Parameters:
+        records (Iterable[dict]): The records to group, e.g. tweets.
+        group_key (Callable[[dict], Hashable]): Group of a record, e.g. the day of a tweet.
+        item_key (Callable[[dict], Hashable]): Item of a record, e.g. the username of a tweet.
+        k_groups (int, optional): Number of groups to return. Defaults to 10.
+        k_items (int, optional): Number of items to return for every group. Defaults to 1.
+        explode (bool, optional): If True, item_key returns an iterable of items, e.g. the hashtags
+            of a tweet, and every one of them is counted. Defaults to False.
+    Returns:
+        GroupedTop: A list of (group, [(item, count), ...]) tuples, best group first.
+    """
+    pair_counts = Counter()
+    if explode:
+        for record in records:
+            group = group_key(record)
+            for item in item_key(record):
+                pair_counts[(group, item)] += 1
+    else:
+        pair_counts.update((group_key(record), item_key(record)) for record in records)
+    return top_k_from_pair_counts(pair_counts, k_groups, k_items)
+
+
+def top_k_from_pair_counts(
+        pair_counts: Mapping[Tuple[Hashable, Hashable], int],
+        k_groups: int = 10,
+        k_items: int = 1
+) -> GroupedTop:
+    """
+    Same as top_k_by_group, starting from the counts of every (group, item) pair.
+
+    Useful when the pair counts are built or merged elsewhere, e.g. by an Aggregator.
+    """
+    group_counter = Counter()
+    for (group, _), counts in pair_counts.items():
+        group_counter[group] += counts
+    top_groups = heapq.nsmallest(k_groups, group_counter.items(), key=lambda item: (-item[1], item[0]))
+
+    items_by_group = {group: [] for group, _ in top_groups}
+    for (group, item), counts in pair_counts.items():
+        items = items_by_group.get(group)
+        if items is not None:
+            items.append((item, counts))
+
+    return [
+        (group, heapq.nsmallest(k_items, items_by_group[group], key=lambda item: (-item[1], item[0])))
+        for group, _ in top_groups
+    ]
+
+
+def top_k_by_group_codes(
+        group_codes: Sequence[int],
+        item_codes: Sequence[int],
+        k_groups: int = 10,
+        k_items: int = 1
+) -> GroupedTop:
+    """
+    Columnar variant of top_k_by_group, for groups and items already encoded as integers.
+
+    The codes must sort like the keys they encode (pd.factorize(..., sort=True) does so), so the
+    ties are broken as in top_k_by_group. The pairs are counted with a single pandas groupby.
+
+    Returns:
+        GroupedTop: A list of (group code, [(item code, count), ...]) tuples, best group first.
+    """
+    import pandas as pd
+
+    pairs = (
+        pd.DataFrame({"group": group_codes, "item": item_codes})
+        .groupby(["group", "item"], sort=False)
+        .size()
+        .reset_index(name="counts")
+    )
+    return top_k_from_pair_frame(pairs, k_groups, k_items)
+
+
+def top_k_from_pair_frame(pairs: "pd.DataFrame", k_groups: int = 10, k_items: int = 1) -> GroupedTop:
+    """
+    Same as top_k_by_group, starting from a DataFrame of pair counts.
+
+    pairs has one row per (group, item) pair, with the columns 'group', 'item' and 'counts', e.g. the
+    reduced result of a Dask groupby. Only the pairs of the top groups are sorted.
+    """
+    top_groups = pairs.groupby("group")["counts"].sum().nlargest(k_groups, keep="first").index
+    top_items = (
+        pairs[pairs["group"].isin(top_groups)]
+        .sort_values(["group", "counts", "item"], ascending=[True, False, True])
+        .groupby("group", sort=False)
+        .head(k_items)
+    )
+
+    items_by_group = {group: [] for group in top_groups}
+    for group, item, counts in zip(top_items["group"], top_items["item"], top_items["counts"]):
+        items_by_group[group].append((item, int(counts)))
+
+    return [(group, items_by_group[group]) for group in top_groups]
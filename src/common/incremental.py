@@ -0,0 +1,176 @@
+import hashlib
+import os
+import pickle
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.common.engine import Aggregator, aggregator_version, default_aggregators, projection_for
+from src.common.gcs.compression import detect_file_compression
+from src.common.gcs.constants import cache_dir, json_file_local_path
+from src.common.gcs.google_storage import decode_lines, iter_file_chunks, iter_lines
+
+# Number of leading bytes hashed to detect that a file was rewritten instead of appended to.
+fingerprint_size = 64 * 1024
+
+
+def default_state_path(file_path: str) -> str:
+    """
+    Location of the persisted aggregation state of a file, inside cache_dir.
+
+    Parameters:
+        file_path (str): Path of the NDJSON file.
+    Returns:
+        str: The path of the state file.
+    """
+    source_hash = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{source_hash}.state")
+
+
+def file_fingerprint(file_path: str, size: int) -> str:
+    """
+    Hash of the first bytes of a file, which appending new lines does not change.
+
+    Parameters:
+        file_path (str): Path of the file.
+        size (int): Number of leading bytes to hash.
+    Returns:
+        str: The hex digest of those bytes.
+    """
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read(size)).hexdigest()
+
+
+def complete_lines_end(file_path: str, start: int) -> int:
+    """
+    Offset right after the last newline of a file, so a line still being appended is not read.
+
+    Parameters:
+        file_path (str): Path of the file.
+        start (int): Offset from which to look for newlines.
+    Returns:
+        int: The end of the last complete line, or start if there is none after it.
+    """
+    with open(file_path, 'rb') as file:
+        end = file.seek(0, os.SEEK_END)
+        while end > start:
+            block_start = max(start, end - fingerprint_size)
+            file.seek(block_start)
+            newline = file.read(end - block_start).rfind(b"\n")
+            if newline != -1:
+                return block_start + newline + 1
+            end = block_start
+    return start
+
+
+def load_state(state_path: str, file_path: str) -> Optional[dict]:
+    """
+    Load the persisted state of a file, if it is still valid for it.
+
+    A state is discarded when the file is now shorter than the processed offset or when its
+    leading bytes changed, since in both cases the file was rewritten rather than appended to.
+    It is also discarded when it was built by aggregators of another aggregator_version.
+
+    Parameters:
+        state_path (str): Path of the state file.
+        file_path (str): Path of the NDJSON file.
+    Returns:
+        dict: The state with 'version', 'offset', 'fingerprint' and 'aggregators', or None when there is no valid state.
+    """
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'rb') as file:
+        state = pickle.load(file)
+    if state.get("version") != aggregator_version:
+        return None
+
+    size = os.path.getsize(file_path)
+    fingerprint_length = min(state["offset"], fingerprint_size)
+    if state["offset"] > size or file_fingerprint(file_path, fingerprint_length) != state["fingerprint"]:
+        return None
+    return state
+
+
+def save_state(state_path: str, state: dict) -> None:
+    """
+    Persist a state atomically, so an interrupted run leaves the previous state untouched.
+
+    Parameters:
+        state_path (str): Path of the state file.
+        state (dict): The state with 'version', 'offset', 'fingerprint' and 'aggregators'.
+    """
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    temporary_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, state_path)
+
+
+def run_incremental(
+        file_path: str = json_file_local_path,
+        state_path: Optional[str] = None,
+        aggregators_factory: Callable[[], List[Aggregator]] = default_aggregators
+) -> Dict[str, list]:
+    """
+    Update the answers with the lines appended to a NDJSON file since the previous run.
+
+    The aggregators (per (date, username) counts, emoji and mention Counters) are persisted with
+    the byte offset up to which the file was processed. A run parses only the complete lines after
+    that offset, updates the aggregators and saves them again, so its cost depends on the amount of
+    new data instead of the size of the file. When the state is missing or the file was rewritten,
+    the file is processed from the beginning, as it is when the aggregators changed since the state
+    was saved (see aggregator_version).
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        state_path (str, optional): Path of the state file. Defaults to default_state_path(file_path).
+        aggregators_factory (Callable[[], List[Aggregator]], optional): Builds the aggregators of
+            a new state. Defaults to default_aggregators.
+    Returns:
+        Dict[str, list]: The result of every aggregator, keyed by its name.
+    """
+    if detect_file_compression(file_path) is not None:
+        raise ValueError("Incremental runs need an uncompressed file, since they resume from a byte offset")
+
+    state_path = state_path or default_state_path(file_path)
+    state = load_state(state_path, file_path)
+    if state is None:
+        state = {"version": aggregator_version, "offset": 0, "fingerprint": None, "aggregators": aggregators_factory()}
+
+    aggregators = state["aggregators"]
+    start = state["offset"]
+    end = complete_lines_end(file_path, start)
+
+    if end > start:
+        updates = [aggregator.update for aggregator in aggregators]
+        lines = iter_lines(iter_file_chunks(file_path, start=start, end=end))
+        for tweet in decode_lines(lines, projection_for(aggregators)):
+            for update in updates:
+                update(tweet)
+
+        state["offset"] = end
+        state["fingerprint"] = file_fingerprint(file_path, min(end, fingerprint_size))
+        save_state(state_path, state)
+
+    return {aggregator.name: aggregator.result() for aggregator in aggregators}
+
+
+def main():
+    """
+    In this main function:
+    1. The aggregation state of the local tweet JSON is loaded, if any.
+    2. Only the lines appended since the previous run are processed.
+    3. While the function is executed, the execution time is calculated.
+
+    This method prints the answers of q1, q2 and q3 and the processing time in seconds.
+    """
+    start_processing_time = time.time()
+    results = run_incremental()
+    end_processing_time = time.time()
+
+    for name, result in results.items():
+        print(f"{name}: {result}")
+    print(f"Total time processing new tweets: {end_processing_time - start_processing_time}, sec")
+
+
+if __name__ == "__main__":
+    main()
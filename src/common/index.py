@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import heapq
+import os
+import pickle
+from collections import Counter
+from datetime import date
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from src.common.emojis import extract_emojis
+from src.common.engine import Aggregator, aggregator_version
+from src.common.gcs.cache import local_source_key
+from src.common.gcs.constants import cache_dir, json_file_local_path
+from src.common.mentions import extract_mentions
+from src.common.parallel import run_sharded
+
+# Day tables keyed by the ordinal of the day (datetime.date.toordinal).
+DayTables = Dict[int, Counter]
+
+
+class TweetIndex(Aggregator):
+    """
+    Day-bucketed count tables of users, emojis and mentions, to answer top-k queries over any
+    range of days, optionally filtered by user, without rescanning the dump.
+
+    The index keeps, for every UTC day (the 'YYYY-MM-DD' prefix of the date, as in q1_time):
+    - users: the number of tweets of every username,
+    - emojis and mentions: the occurrences of every emoji (see extract_emojis) and mentioned
+      handle (see extract_mentions),
+    and, for every username, its own emoji and mention tables per day.
+
+    A query merges the tables of the days in its range, which are orders of magnitude smaller
+    than the tweets. Since TweetIndex is an Aggregator, it can be built by run_queries or in
+    parallel by run_sharded, see build_index.
+    """
+    name = "index"
+    fields = ('date', 'user.username', 'content')
+
+    def __init__(self):
+        self.tweets = 0
+        self.users: DayTables = {}
+        self.emojis: DayTables = {}
+        self.mentions: DayTables = {}
+        self.user_emojis: Dict[str, DayTables] = {}
+        self.user_mentions: Dict[str, DayTables] = {}
+        self._day_ordinals: Dict[str, int] = {}
+
+    def update(self, tweet: dict) -> None:
+        day_name = tweet["date"][:10]
+        day = self._day_ordinals.get(day_name)
+        if day is None:
+            day = self._day_ordinals[day_name] = date.fromisoformat(day_name).toordinal()
+        username = tweet["user"]["username"]
+        content = tweet.get("content") or ""
+
+        self.tweets += 1
+        _table(self.users, day)[username] += 1
+        emojis = extract_emojis(content)
+        if emojis:
+            _table(self.emojis, day).update(emojis)
+            _table(self.user_emojis.setdefault(username, {}), day).update(emojis)
+        mentions = extract_mentions(content)
+        if mentions:
+            _table(self.mentions, day).update(mentions)
+            _table(self.user_mentions.setdefault(username, {}), day).update(mentions)
+
+    def merge(self, other: "TweetIndex") -> None:
+        self.tweets += other.tweets
+        for tables, other_tables in (
+                (self.users, other.users),
+                (self.emojis, other.emojis),
+                (self.mentions, other.mentions),
+        ):
+            _merge_tables(tables, other_tables)
+        for by_user, other_by_user in ((self.user_emojis, other.user_emojis), (self.user_mentions, other.user_mentions)):
+            for username, other_tables in other_by_user.items():
+                _merge_tables(by_user.setdefault(username, {}), other_tables)
+
+    def result(self) -> "TweetIndex":
+        return self
+
+    def days(self) -> List[date]:
+        return [date.fromordinal(day) for day in sorted(self.users)]
+
+    def top_dates(self, k: int = 10, start: Optional[date] = None, end: Optional[date] = None) -> List[Tuple[date, str]]:
+        """
+        Top days by number of tweets, with the user that published the most on each of them (q1).
+
+        Ties are broken as in q1_time: the earlier date and the username that sorts first win.
+        """
+        totals = ((day, sum(table.values())) for day, table in _tables_between(self.users, start, end))
+        top_days = heapq.nsmallest(k, totals, key=lambda item: (-item[1], item[0]))
+        return [(date.fromordinal(day), _top(self.users[day], 1)[0][0]) for day, _ in top_days]
+
+    def top_users(self, k: int = 10, start: Optional[date] = None, end: Optional[date] = None) -> List[Tuple[str, int]]:
+        """
+        Users that published the most tweets between start and end, both included.
+        """
+        return _top(_merge_between(self.users, start, end), k)
+
+    def top_emojis(
+            self,
+            k: int = 10,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            user: Optional[str] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Most used emojis between start and end, both included, optionally only in the tweets of user (q2).
+        """
+        tables = self.emojis if user is None else self.user_emojis.get(user, {})
+        return _top(_merge_between(tables, start, end), k)
+
+    def top_mentions(
+            self,
+            k: int = 10,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            user: Optional[str] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Most mentioned users between start and end, both included, optionally only by user (q3).
+        """
+        tables = self.mentions if user is None else self.user_mentions.get(user, {})
+        return _top(_merge_between(tables, start, end), k)
+
+
+def _table(tables: DayTables, day: int) -> Counter:
+    table = tables.get(day)
+    if table is None:
+        table = tables[day] = Counter()
+    return table
+
+
+def _merge_tables(tables: DayTables, other_tables: DayTables) -> None:
+    for day, other_table in other_tables.items():
+        _table(tables, day).update(other_table)
+
+
+def _tables_between(tables: DayTables, start: Optional[date], end: Optional[date]) -> Iterable[Tuple[int, Counter]]:
+    first_day = start.toordinal() if start else None
+    last_day = end.toordinal() if end else None
+    for day, table in tables.items():
+        if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+            yield day, table
+
+
+def _merge_between(tables: DayTables, start: Optional[date], end: Optional[date]) -> Counter:
+    merged = Counter()
+    for _, table in _tables_between(tables, start, end):
+        merged.update(table)
+    return merged
+
+
+def _top(counter: Counter, k: int) -> List[Tuple[Hashable, int]]:
+    # Ties are broken by the order of the items, so the answer does not depend on the merge order.
+    return heapq.nsmallest(k, counter.items(), key=lambda item: (-item[1], item[0]))
+
+
+def default_index_path(file_path: str) -> str:
+    """
+    Location of the persisted index of a file, inside cache_dir.
+
+    Parameters:
+        file_path (str): Path of the NDJSON file.
+    Returns:
+        str: The path of the index file.
+    """
+    source_hash = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{source_hash}.index")
+
+
+def build_index(file_path: str = json_file_local_path, workers: Optional[int] = None) -> TweetIndex:
+    """
+    Build the index of a local NDJSON file with a pool of processes, see run_sharded.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        workers (int, optional): Number of processes. Defaults to None, the number of CPUs.
+    Returns:
+        TweetIndex: The index of the whole file.
+    """
+    return run_sharded(TweetIndex, file_path, workers)
+
+
+def save_index(index: TweetIndex, index_path: str, version: str) -> None:
+    """
+    Persist an index atomically, with the version of the source it was built from and aggregator_version.
+
+    Parameters:
+        index (TweetIndex): Index to persist.
+        index_path (str): Path of the index file.
+        version (str): Version of the source, see local_source_key.
+    """
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    temporary_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        state = {"version": version, "aggregator_version": aggregator_version, "index": index}
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, index_path)
+
+
+def load_index(index_path: str, version: str) -> Optional[TweetIndex]:
+    """
+    Load a persisted index, if it was built from the given version of the source by the current aggregators.
+
+    Parameters:
+        index_path (str): Path of the index file.
+        version (str): Current version of the source, see local_source_key.
+    Returns:
+        TweetIndex: The index, or None when there is none or it is stale.
+    """
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, 'rb') as file:
+        state = pickle.load(file)
+    if state["version"] != version or state.get("aggregator_version") != aggregator_version:
+        return None
+    return state["index"]
+
+
+def load_or_build_index(
+        file_path: str = json_file_local_path,
+        index_path: Optional[str] = None,
+        workers: Optional[int] = None
+) -> TweetIndex:
+    """
+    Load the persisted index of a local file, building and persisting it first if it is missing or stale.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        index_path (str, optional): Path of the index file. Defaults to default_index_path(file_path).
+        workers (int, optional): Number of processes used to build it. Defaults to None, the number of CPUs.
+    Returns:
+        TweetIndex: The index of the file.
+    """
+    index_path = index_path or default_index_path(file_path)
+    version = local_source_key(file_path)
+    index = load_index(index_path, version)
+    if index is None:
+        print("Building the index")
+        index = build_index(file_path, workers)
+        save_index(index, index_path, version)
+    return index
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    In this main function:
+    1. The index of the local tweet JSON is loaded, or built and persisted if it is missing or stale.
+    2. A range query is answered from the day tables for the selected kind of item.
+
+    Example:
+        python -m src.common.index mentions --start 2021-02-12 --end 2021-02-12 -k 5
+        python -m src.common.index emojis --user RanbirS00614606
+    """
+    parser = argparse.ArgumentParser(description="Answer top-k range queries from the per-day index.")
+    parser.add_argument("kind", choices=("dates", "users", "emojis", "mentions"))
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--user", help="Only count the tweets of this user (emojis and mentions).")
+    parser.add_argument("--file", default=json_file_local_path)
+    parser.add_argument("--index", help="Path of the index file. Defaults to a file in cache_dir.")
+    args = parser.parse_args(argv)
+
+    index = load_or_build_index(args.file, args.index)
+    if args.kind == "dates":
+        result = index.top_dates(args.k, args.start, args.end)
+    elif args.kind == "users":
+        result = index.top_users(args.k, args.start, args.end)
+    elif args.kind == "emojis":
+        result = index.top_emojis(args.k, args.start, args.end, args.user)
+    else:
+        result = index.top_mentions(args.k, args.start, args.end, args.user)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
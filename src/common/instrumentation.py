@@ -0,0 +1,366 @@
+import atexit
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, Optional
+
+# Environment variables that turn the instrumentation on without changing the code:
+# LATAM_INSTRUMENT=1 collects counters and spans, LATAM_INSTRUMENT=cprofile or pyinstrument also
+# profiles the run, and the report is printed at exit (or written to LATAM_PROFILE_OUTPUT).
+instrument_env = "LATAM_INSTRUMENT"
+profile_output_env = "LATAM_PROFILE_OUTPUT"
+
+profilers = ("cprofile", "pyinstrument")
+
+
+class Metrics:
+    """
+    Counters and spans collected while the instrumentation is enabled.
+
+    Counters are named running totals (bytes downloaded, lines parsed, records per aggregator...).
+    Spans are named timed sections, with the number of calls, the total and the slowest duration.
+    Updates take a lock, since the download and pipeline stages run in threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.spans: Dict[str, list] = {}
+        self.errors: Dict[str, str] = {}
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Add value to the counter name.
+
+        Parameters:
+            name (str): Name of the counter.
+            value (float, optional): Amount to add. Defaults to 1.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_span(self, name: str, seconds: float) -> None:
+        """
+        Record one call of the span name.
+
+        Parameters:
+            name (str): Name of the span.
+            seconds (float): Duration of the call.
+        """
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = max(span[2], seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Raw copy of the metrics, small and picklable, to send them from a worker process.
+
+        Returns:
+            dict: The "counters", "spans" and "errors", to pass to merge.
+        """
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "spans": {name: list(span) for name, span in self.spans.items()},
+                "errors": dict(self.errors),
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """
+        Add the metrics of a snapshot, e.g. collected by a worker process, to these ones.
+
+        Parameters:
+            snapshot (dict): Metrics returned by snapshot.
+        """
+        with self.lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, (calls, seconds, slowest) in snapshot["spans"].items():
+                span = self.spans.get(name)
+                if span is None:
+                    self.spans[name] = [calls, seconds, slowest]
+                else:
+                    span[0] += calls
+                    span[1] += seconds
+                    span[2] = max(span[2], slowest)
+            self.errors.update(snapshot["errors"])
+
+    def as_dict(self) -> dict:
+        """
+        Snapshot of the metrics.
+
+        Returns:
+            dict: The "counters", the "spans" with their "calls", "seconds" and "max_seconds", the
+            last message of every "errors" source, and the derived "rates" per second.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            spans = {
+                name: {"calls": calls, "seconds": seconds, "max_seconds": slowest}
+                for name, (calls, seconds, slowest) in self.spans.items()
+            }
+            errors = dict(self.errors)
+
+        rates = {}
+        parse_seconds = spans.get("parse", {}).get("seconds")
+        if parse_seconds:
+            rates["lines_per_second"] = counters.get("lines_parsed", 0) / parse_seconds
+        download_seconds = spans.get("gcs.download", {}).get("seconds")
+        if download_seconds:
+            rates["downloaded_bytes_per_second"] = counters.get("gcs.bytes_downloaded", 0) / download_seconds
+        return {"counters": counters, "spans": spans, "errors": errors, "rates": rates}
+
+
+class _State:
+    enabled = False
+    metrics = Metrics()
+    profiler = None
+    profiler_kind: Optional[str] = None
+
+
+_state = _State()
+
+
+def is_enabled() -> bool:
+    """
+    Returns:
+        bool: True if the metrics are being collected.
+    """
+    return _state.enabled
+
+
+def enable(profile: Optional[str] = None) -> None:
+    """
+    Start collecting metrics, optionally profiling the process.
+
+    Parameters:
+        profile (str, optional): "cprofile" or "pyinstrument" to also profile the code run until
+            report is called. pyinstrument must be installed. Defaults to None.
+    """
+    if profile is not None and profile not in profilers:
+        raise ValueError(f"profile must be one of {profilers}")
+    _state.enabled = True
+    if profile and _state.profiler is None:
+        if profile == "cprofile":
+            import cProfile
+            _state.profiler = cProfile.Profile()
+            _state.profiler.enable()
+        else:
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                raise ImportError("pyinstrument profiling requires the pyinstrument package") from e
+            _state.profiler = Profiler()
+            _state.profiler.start()
+        _state.profiler_kind = profile
+
+
+def disable() -> None:
+    """
+    Stop collecting metrics.
+
+    The collected metrics and the profiler, if any, are kept until report.
+    """
+    _state.enabled = False
+
+
+def reset() -> None:
+    """
+    Drop the collected metrics.
+    """
+    _state.metrics = Metrics()
+
+
+def _stop_profiler(kind: Optional[str]):
+    profiler = _state.profiler
+    if profiler is None:
+        return None
+    if kind == "cprofile":
+        profiler.disable()
+    else:
+        profiler.stop()
+    _state.profiler = None
+    return profiler
+
+
+def count(name: str, value: float = 1) -> None:
+    """
+    Add value to a counter. Does nothing when the instrumentation is disabled.
+
+    Parameters:
+        name (str): Name of the counter, e.g. "gcs.bytes_downloaded".
+        value (float, optional): Amount to add. Defaults to 1.
+    """
+    if _state.enabled:
+        _state.metrics.count(name, value)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """
+    Record a timed section measured by the caller. Does nothing when the instrumentation is disabled.
+
+    Parameters:
+        name (str): Name of the span.
+        seconds (float): Duration of the section.
+    """
+    if _state.enabled:
+        _state.metrics.add_span(name, seconds)
+
+
+def record_error(source: str, error: BaseException) -> None:
+    """
+    Count an error swallowed by a function and keep its message, under "errors.<source>".
+
+    Parameters:
+        source (str): Name of the function that caught the error, e.g. "q1_time".
+        error (BaseException): The error.
+    """
+    if _state.enabled:
+        _state.metrics.count(f"errors.{source}")
+        with _state.metrics.lock:
+            _state.metrics.errors[source] = f"{type(error).__name__}: {error}"
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _state.metrics.add_span(name, time.perf_counter() - start)
+
+
+_disabled_span = nullcontext()
+
+
+def span(name: str):
+    """
+    Context manager that records the time spent in its block as a span.
+
+    When the instrumentation is disabled a shared no-op context manager is returned.
+
+    Parameters:
+        name (str): Name of the span.
+    Returns:
+        The context manager.
+    """
+    if _state.enabled:
+        return _timed(name)
+    return _disabled_span
+
+
+def instrumented(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator that records every call of the function as a span.
+
+    When the instrumentation is disabled the only cost is a flag check per call.
+
+    Parameters:
+        name (str): Name of the span.
+    Returns:
+        Callable[[Callable], Callable]: The decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _state.metrics.add_span(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def report(output: Optional[str] = None) -> dict:
+    """
+    Collect the metrics and stop the profiler, if any.
+
+    Parameters:
+        output (str, optional): Path where the profile is written, as pstats data for cProfile or
+            as HTML for pyinstrument. Defaults to None, which adds a text summary to the report.
+    Returns:
+        dict: The metrics, see Metrics.as_dict, plus the "profile" summary, or the path it was written to.
+    """
+    kind, _state.profiler_kind = _state.profiler_kind, None
+    profiler = _stop_profiler(kind)
+    result = _state.metrics.as_dict()
+    if profiler is None:
+        return result
+
+    if kind == "cprofile":
+        if output:
+            profiler.dump_stats(output)
+            result["profile"] = f"Profile written to {output}"
+        else:
+            import io
+            import pstats
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(30)
+            result["profile"] = stream.getvalue()
+    else:
+        if output:
+            with open(output, "w") as file:
+                file.write(profiler.output_html())
+            result["profile"] = f"Profile written to {output}"
+        else:
+            result["profile"] = profiler.output_text()
+    return result
+
+
+def snapshot() -> Optional[dict]:
+    """
+    Raw copy of the collected metrics, see Metrics.snapshot.
+
+    Returns:
+        dict: The metrics, or None when the instrumentation is disabled.
+    """
+    return _state.metrics.snapshot() if _state.enabled else None
+
+
+def merge(metrics: Optional[dict]) -> None:
+    """
+    Add the metrics collected elsewhere, e.g. by a worker process, to the ones of this process.
+
+    Parameters:
+        metrics (dict, optional): A snapshot, or None, which is ignored.
+    """
+    if metrics is not None:
+        _state.metrics.merge(metrics)
+
+
+def print_report(output: Optional[str] = None) -> None:
+    """
+    Print the report of the run.
+
+    Parameters:
+        output (str, optional): Where the profile is written, see report. Defaults to None.
+    """
+    result = report(output)
+    profile = result.pop("profile", None)
+    print("Instrumentation report:")
+    for section, values in result.items():
+        for name, value in sorted(values.items()):
+            print(f"    {section}.{name}: {value}")
+    if profile:
+        print(profile)
+
+
+def _enable_from_environment() -> None:
+    setting = os.environ.get(instrument_env, "").strip().lower()
+    if setting in ("", "0", "false", "no"):
+        return
+    enable(setting if setting in profilers else None)
+    atexit.register(print_report, os.environ.get(profile_output_env))
+
+
+_enable_from_environment()
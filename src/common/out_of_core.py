@@ -0,0 +1,77 @@
+from typing import Optional, Sequence
+
+import dask.dataframe as dd
+import pandas as pd
+from fsspec.utils import infer_compression
+
+from src.common.gcs.constants import dask_blocksize, gcs_bucket_name, gcs_blob_name
+
+
+def gcs_uri(bucket_name: str = gcs_bucket_name, blob_name: str = gcs_blob_name) -> str:
+    """
+    Build the gs:// path of a blob, readable by Dask through gcsfs.
+
+    Parameters:
+        bucket_name (str, optional): Bucket of the blob. Defaults to gcs_bucket_name.
+        blob_name (str, optional): Name of the blob. Defaults to gcs_blob_name.
+    Returns:
+        str: The gs://bucket/blob path.
+    """
+    return f"gs://{bucket_name}/{blob_name}"
+
+
+def project_frame(df: pd.DataFrame, fields: Sequence[str]) -> pd.DataFrame:
+    """
+    Keep only the requested fields of a partition of tweets, flattening nested ones.
+
+    Parameters:
+        df (pd.DataFrame): A partition as returned by pandas.read_json, with nested objects as dicts.
+        fields (Sequence[str]): Dotted paths of the fields to keep, e.g. ["date", "user.username"].
+    Returns:
+        pd.DataFrame: One object column per field, named after its dotted path.
+    """
+    columns = {}
+    for field in fields:
+        root, *keys = field.split(".")
+        column = df[root] if root in df else pd.Series(None, index=df.index, dtype=object)
+        for key in keys:
+            column = column.str.get(key)
+        columns[field] = column
+    return pd.DataFrame(columns, index=df.index)
+
+
+def read_tweets(
+        path: str,
+        fields: Sequence[str],
+        blocksize: int = dask_blocksize,
+        storage_options: Optional[dict] = None
+) -> dd.DataFrame:
+    """
+    Lazily read a NDJSON dump as a partitioned Dask DataFrame, projected to the given fields.
+
+    Each partition is a byte block of the file split on line boundaries and is parsed only when
+    a computation needs it, so reductions over the result run partition by partition without the
+    whole dataset ever being resident. Paths ending in .gz or .zst are decompressed by fsspec.
+
+    Parameters:
+        path (str): Local path, or gs:// path (see gcs_uri) of the NDJSON dump.
+        fields (Sequence[str]): Dotted paths of the fields to keep.
+        blocksize (int, optional): Size in bytes of every partition. Defaults to dask_blocksize.
+        storage_options (dict, optional): Options for the filesystem, e.g. for a local GCS emulator
+            {"endpoint_url": "http://localhost:4443", "token": "anon"}. Defaults to None.
+    Returns:
+        dd.DataFrame: One object column per field, named after its dotted path.
+    """
+    # Compressed dumps cannot be split into byte blocks, so they are read as a single partition.
+    compression = infer_compression(path)
+    ddf = dd.read_json(
+        path,
+        lines=True,
+        blocksize=None if compression else blocksize,
+        compression=compression,
+        storage_options=storage_options,
+        convert_dates=False,
+        dtype=False,
+    )
+    meta = pd.DataFrame({field: pd.Series(dtype=object) for field in fields})
+    return ddf.map_partitions(project_frame, fields, meta=meta)
@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Type
+
+from src.common import instrumentation
+from src.common.engine import Aggregator
+from src.common.gcs.compression import detect_file_compression
+from src.common.gcs.google_storage import decode_lines, iter_local_lines, iter_mmap_lines
+
+
+def shard_file(file_path: str, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split a NDJSON file into byte ranges that start and end on line boundaries.
+
+    The file is cut at evenly spaced offsets and every cut is moved forward to the beginning of
+    the next line, so each line belongs to exactly one range. Small files can produce fewer
+    ranges than requested.
+
+    Parameters:
+        file_path (str): Path of the NDJSON file.
+        shards (int): Number of ranges wanted.
+    Returns:
+        List[Tuple[int, int]]: Non-empty (start, end) byte ranges covering the whole file.
+    """
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as file:
+        for index in range(1, shards):
+            file.seek(max(size * index // shards - 1, boundaries[-1]))
+            file.readline()
+            boundaries.append(max(file.tell(), boundaries[-1]))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def aggregate_shard(
+        aggregator_class: Type[Aggregator],
+        file_path: str,
+        start: int,
+        end: int,
+        instrument: bool = False
+) -> Tuple[Aggregator, Optional[dict]]:
+    """
+    Feed one byte range of a NDJSON file to a new aggregator. Runs inside the worker processes.
+
+    Every worker maps the file and parses its lines in place, so the shards are not copied.
+    Worker processes do not share the metrics of the parent, so when instrument is set the shard
+    collects its own, from scratch, and returns them to be merged by the parent.
+
+    Parameters:
+        aggregator_class (Type[Aggregator]): Aggregator to build, with its default arguments.
+        file_path (str): Path of the NDJSON file.
+        start (int): Offset of the first byte of the range, at the beginning of a line.
+        end (int): Offset right after the last byte of the range.
+        instrument (bool, optional): Collect the metrics of the shard, see instrumentation. Defaults to False.
+    Returns:
+        Tuple[Aggregator, Optional[dict]]: The aggregator with the partial counts of the range, and
+        the metrics of the shard (see instrumentation.snapshot), or None if instrument is not set.
+    """
+    if instrument:
+        instrumentation.reset()
+        instrumentation.enable()
+    aggregator = aggregator_class()
+    update = aggregator.update
+    for tweet in decode_lines(iter_mmap_lines(file_path, start, end), aggregator.fields):
+        update(tweet)
+    return aggregator, instrumentation.snapshot() if instrument else None
+
+
+def run_sharded(
+        aggregator_class: Type[Aggregator],
+        file_path: str,
+        workers: Optional[int] = None
+) -> Aggregator:
+    """
+    Aggregate a local NDJSON file with a pool of processes, one byte range per process.
+
+    Every worker parses and counts its own range independently, then the partial aggregators are
+    merged in the parent, so parsing and counting scale with the number of cores instead of
+    being bound to the GIL. Compressed files cannot be split at arbitrary offsets, so they are
+    aggregated in this process from the decompressed stream instead, see iter_local_lines. For
+    bgzip files only the inflation of the blocks is parallel (in threads, see decompress_chunks):
+    lines cross the block boundaries, so the blocks are not sharded across processes.
+    When the instrumentation is enabled, the metrics of every worker are merged into the parent's.
+
+    Parameters:
+        aggregator_class (Type[Aggregator]): Mergeable aggregator to run, e.g. EmojiAggregator.
+        file_path (str): Path of the NDJSON file.
+        workers (int, optional): Number of processes. Defaults to None, the number of CPUs.
+    Returns:
+        Aggregator: An aggregator holding the counts of the whole file.
+    """
+    if detect_file_compression(file_path) is not None:
+        aggregator = aggregator_class()
+        update = aggregator.update
+        for tweet in decode_lines(iter_local_lines(file_path), aggregator.fields):
+            update(tweet)
+        return aggregator
+
+    workers = workers or os.cpu_count() or 1
+    shards = shard_file(file_path, workers)
+
+    instrument = instrumentation.is_enabled()
+    aggregator = aggregator_class()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(aggregate_shard, aggregator_class, file_path, start, end, instrument)
+            for start, end in shards
+        ]
+        for future in futures:
+            shard_aggregator, metrics = future.result()
+            aggregator.merge(shard_aggregator)
+            instrumentation.merge(metrics)
+    return aggregator
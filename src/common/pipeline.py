@@ -0,0 +1,239 @@
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence
+
+from src.common import instrumentation
+from src.common.engine import Aggregator, default_aggregators, projection_for
+from src.common.gcs.compression import decompress_chunks
+from src.common.gcs.constants import gcs_download_workers, pipeline_queue_size
+from src.common.gcs.google_storage import decode_lines, gcs_blob, iter_blob_chunks
+
+_done = object()
+
+
+class StageStats:
+    """
+    Counters of one pipeline stage.
+
+    busy_seconds is the time spent doing the work of the stage, blocked_seconds the time spent
+    waiting for room in a full output queue (backpressure from the next stage) and
+    starved_seconds the time spent waiting for input from the previous stage.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def add(self, items: int = 0, nbytes: int = 0, busy: float = 0.0, blocked: float = 0.0, starved: float = 0.0):
+        with self._lock:
+            self.items += items
+            self.bytes += nbytes
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            self.starved_seconds += starved
+
+    def as_dict(self, elapsed: float) -> dict:
+        """
+        Counters of the stage with its throughput over the whole run.
+
+        Parameters:
+            elapsed (float): Wall-clock duration of the run in seconds.
+        Returns:
+            dict: The counters, plus items and MiB per second of wall-clock time.
+        """
+        return {
+            "items": self.items,
+            "bytes": self.bytes,
+            "busy_seconds": self.busy_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "starved_seconds": self.starved_seconds,
+            "max_queue_depth": self.max_queue_depth,
+            "items_per_second": self.items / elapsed if elapsed else 0.0,
+            "mib_per_second": self.bytes / 2 ** 20 / elapsed if elapsed else 0.0,
+        }
+
+
+class _Pipeline:
+    def __init__(self, aggregators: Sequence[Aggregator], queue_size: int):
+        self.aggregators = aggregators
+        self.blocks = queue.Queue(maxsize=queue_size)
+        self.records = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(name) for name in ("fetch", "parse", "aggregate")}
+        self.stop = threading.Event()
+        self.errors: List[BaseException] = []
+
+    def put(self, target: queue.Queue, item, stats: StageStats) -> None:
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.add(blocked=time.perf_counter() - start)
+        stats.max_queue_depth = max(stats.max_queue_depth, target.qsize())
+
+    def get(self, source: queue.Queue, stats: StageStats):
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                item = source.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _done
+        stats.add(starved=time.perf_counter() - start)
+        return item
+
+    def fail(self, error: BaseException) -> None:
+        self.errors.append(error)
+        self.stop.set()
+
+    def fetch(self, chunks: Iterable[bytes]) -> None:
+        # Cut the chunks on their last newline, so every block holds complete lines only.
+        stats = self.stats["fetch"]
+        try:
+            remainder = b""
+            iterator = iter(chunks)
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                chunk = next(iterator, None)
+                if chunk is None:
+                    break
+                cut = chunk.rfind(b"\n") + 1
+                if cut:
+                    block, remainder = remainder + chunk[:cut], chunk[cut:]
+                else:
+                    block, remainder = b"", remainder + chunk
+                stats.add(items=1, nbytes=len(chunk), busy=time.perf_counter() - start)
+                if block:
+                    self.put(self.blocks, block, stats)
+            if remainder:
+                self.put(self.blocks, remainder, stats)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            self.put(self.blocks, _done, stats)
+
+    def parse(self, fields: Sequence[str]) -> None:
+        stats = self.stats["parse"]
+        try:
+            while True:
+                block = self.get(self.blocks, stats)
+                if block is _done:
+                    break
+                start = time.perf_counter()
+                records = list(decode_lines((line for line in block.split(b"\n") if line.strip()), fields))
+                stats.add(items=len(records), nbytes=len(block), busy=time.perf_counter() - start)
+                self.put(self.records, records, stats)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            self.put(self.records, _done, stats)
+
+    def aggregate(self) -> None:
+        stats = self.stats["aggregate"]
+        updates = [aggregator.update for aggregator in self.aggregators]
+        try:
+            while True:
+                records = self.get(self.records, stats)
+                if records is _done:
+                    break
+                start = time.perf_counter()
+                for record in records:
+                    for update in updates:
+                        update(record)
+                stats.add(items=len(records), busy=time.perf_counter() - start)
+        except BaseException as e:
+            self.fail(e)
+
+
+def run_pipeline(
+        chunks: Iterable[bytes],
+        aggregators: Sequence[Aggregator],
+        queue_size: int = pipeline_queue_size
+) -> Dict[str, dict]:
+    """
+    Fetch, parse and aggregate NDJSON chunks in overlapping stages connected by bounded queues.
+
+    A fetcher thread pulls the chunks (e.g. concurrent ranged downloads) and cuts them into blocks
+    of complete lines, a parser thread decodes the blocks into projected records, and an aggregator
+    thread feeds the records to the aggregators. The bounded queues keep at most queue_size blocks
+    and record batches in memory: a slow stage blocks the previous one, which is reported as
+    backpressure in its stats.
+
+    The stages are threads, so only the work that releases the GIL overlaps with the rest: the
+    downloads (and the bgzip inflation) run while the records are parsed and counted, but parsing
+    and counting share one core. That is why there is a single parser. To parse on every core,
+    use run_sharded on a local copy of the dump.
+
+    Parameters:
+        chunks (Iterable[bytes]): Raw content of the dump in order, e.g. from iter_blob_chunks.
+        aggregators (Sequence[Aggregator]): Aggregators to feed, with unique names.
+        queue_size (int, optional): Capacity of each queue. Defaults to pipeline_queue_size.
+    Returns:
+        Dict[str, dict]: For every aggregator name, its "result", plus a "stages" entry with the
+        stats of "fetch", "parse" and "aggregate" (see StageStats) and the total "seconds".
+    """
+    pipeline = _Pipeline(aggregators, queue_size)
+    threads = [
+        threading.Thread(target=pipeline.fetch, args=(chunks,), name="fetch"),
+        threading.Thread(target=pipeline.parse, args=(projection_for(aggregators),), name="parse"),
+        threading.Thread(target=pipeline.aggregate, name="aggregate"),
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if pipeline.errors:
+        raise pipeline.errors[0]
+
+    results = {aggregator.name: {"result": aggregator.result()} for aggregator in aggregators}
+    results["stages"] = {name: stats.as_dict(elapsed) for name, stats in pipeline.stats.items()}
+    results["stages"]["seconds"] = elapsed
+
+    if instrumentation.is_enabled():
+        for name, stats in pipeline.stats.items():
+            instrumentation.count(f"pipeline.{name}.items", stats.items)
+            instrumentation.add_span(f"pipeline.{name}", stats.busy_seconds)
+        for aggregator in aggregators:
+            instrumentation.count(f"records.{aggregator.name}", pipeline.stats["aggregate"].items)
+    return results
+
+
+def main():
+    """
+    In this main function:
+    1. The tweet JSON is downloaded from Google Cloud Storage in concurrent byte ranges.
+    2. The ranges are parsed and aggregated for q1, q2 and q3 while the download goes on.
+    3. The answers are printed with the throughput and backpressure of every stage.
+    """
+    aggregators = default_aggregators()
+    results = run_pipeline(decompress_chunks(iter_blob_chunks(gcs_blob(), workers=gcs_download_workers)), aggregators)
+
+    for aggregator in aggregators:
+        print(f"{aggregator.name}: {results[aggregator.name]['result']}")
+    for name in ("fetch", "parse", "aggregate"):
+        stats = results["stages"][name]
+        print(
+            f"{name:<10} {stats['items']:>10} items  {stats['mib_per_second']:8.2f} MiB/s  "
+            f"busy {stats['busy_seconds']:.2f}s  blocked {stats['blocked_seconds']:.2f}s  "
+            f"starved {stats['starved_seconds']:.2f}s  max queue {stats['max_queue_depth']}"
+        )
+    print(f"Total time: {results['stages']['seconds']}, sec")
+
+
+if __name__ == "__main__":
+    main()
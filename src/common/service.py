@@ -0,0 +1,281 @@
+import argparse
+import os
+import threading
+import time
+from datetime import date
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import orjson
+
+from src.common.engine import run_queries
+from src.common.gcs.cache import gcs_source_key, local_source_key
+from src.common.gcs.constants import (
+    json_file_local_path,
+    query_cache_size,
+    service_host,
+    service_port,
+    source_check_interval,
+)
+from src.common.gcs.google_storage import gcs_blob, stream_json_from_gcs
+from src.common.index import TweetIndex, load_or_build_index
+
+questions = ("q1", "q2", "q3")
+
+
+class TweetStore:
+    """
+    The per-day index of the dump kept resident, with memoized top-k queries.
+
+    The dump is downloaded and parsed once into a TweetIndex (persisted for local files, see
+    load_or_build_index), and every query merges the day tables of its range. Before answering,
+    the store checks the version of the source (size and modification time of a local file,
+    generation and etag of the blob), at most every check_interval seconds, and reloads the
+    tweets when it changed. The results are kept in an LRU cache keyed by the index they were
+    computed on, so a reload invalidates all of them.
+    """
+
+    def __init__(
+            self,
+            source: str = "local",
+            file_path: str = json_file_local_path,
+            check_interval: float = source_check_interval,
+            cache_size: int = query_cache_size
+    ):
+        """
+        Parameters:
+            source (str, optional): "local" for file_path, "gcs" for the blob of the constants. Defaults to "local".
+            file_path (str, optional): Path of the local dump. Defaults to json_file_local_path.
+            check_interval (float, optional): Minimum seconds between two checks of the source version.
+                Defaults to source_check_interval.
+            cache_size (int, optional): Number of query results kept. Defaults to query_cache_size.
+        """
+        if source not in ("local", "gcs"):
+            raise ValueError("source must be 'local' or 'gcs'")
+        self.source = source
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self.index: Optional[TweetIndex] = None
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self._cached_query = lru_cache(maxsize=cache_size)(self._compute)
+
+    def source_version(self) -> str:
+        if self.source == "gcs":
+            blob = gcs_blob()
+            blob.reload()
+            return gcs_source_key(blob)
+        return local_source_key(self.file_path)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the tweets if the source changed since they were loaded.
+
+        Parameters:
+            force (bool, optional): Check the source even if it was checked less than check_interval
+                seconds ago. Defaults to False.
+        Returns:
+            bool: True if the tweets were (re)loaded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.index is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            version = self.source_version()
+            if version == self.version:
+                return False
+
+            print(f"Loading tweets from {self.source} (version {version})")
+            if self.source == "gcs":
+                index = run_queries(stream_json_from_gcs(fields=TweetIndex.fields), [TweetIndex()])["index"]["result"]
+            else:
+                index = load_or_build_index(self.file_path)
+            self.index, self.version, self.loaded_at = index, version, time.time()
+            self._cached_query.cache_clear()
+            return True
+
+    def query(
+            self,
+            question: str,
+            k: int = 10,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            user: Optional[str] = None
+    ) -> list:
+        """
+        Answer a question over the tweets published between two days.
+
+        Parameters:
+            question (str): "q1", "q2" or "q3".
+            k (int, optional): Number of dates (q1), emojis (q2) or users (q3) to return. Defaults to 10.
+            start (date, optional): First day included. Defaults to None, no lower bound.
+            end (date, optional): Last day included. Defaults to None, no upper bound.
+            user (str, optional): Only count the tweets of this user, for q2 and q3. Defaults to None.
+        Returns:
+            list: The answer of the question restricted to the range. Ties between emojis and
+            between users are broken by their order, see TweetIndex.
+        """
+        if question not in questions:
+            raise ValueError(f"question must be one of {questions}")
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        if user is not None and question == "q1":
+            raise ValueError("user only applies to q2 and q3")
+        self.refresh()
+        return self._cached_query(self.index, question, k, start, end, user)
+
+    def cache_info(self):
+        return self._cached_query.cache_info()
+
+    def _compute(
+            self,
+            index: TweetIndex,
+            question: str,
+            k: int,
+            start: Optional[date],
+            end: Optional[date],
+            user: Optional[str]
+    ) -> list:
+        if question == "q1":
+            return index.top_dates(k, start, end)
+        if question == "q2":
+            return index.top_emojis(k, start, end, user)
+        return index.top_mentions(k, start, end, user)
+
+
+def parse_query(query: str) -> Tuple[int, Optional[date], Optional[date], Optional[str]]:
+    """
+    Parse the k, start, end and user parameters of a query string, e.g. "k=5&start=2021-02-12".
+
+    Raises:
+        ValueError: If a parameter is malformed.
+    """
+    params = parse_qs(query)
+    k = int(params.get("k", ["10"])[0])
+    start = date.fromisoformat(params["start"][0]) if "start" in params else None
+    end = date.fromisoformat(params["end"][0]) if "end" in params else None
+    user = params["user"][0] if "user" in params else None
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    return k, start, end, user
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Serve GET /q1, /q2 and /q3 with optional k, start, end and user parameters, and GET /health.
+
+    Answers are JSON objects with the "result" and the "seconds" spent answering.
+    """
+    store: TweetStore
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.strip("/")
+        try:
+            if path == "health":
+                index = self.store.index
+                self.respond(200, {
+                    "source": self.store.source,
+                    "version": self.store.version,
+                    "tweets": index.tweets if index is not None else 0,
+                    "loaded_at": self.store.loaded_at,
+                    "cache": self.store.cache_info()._asdict(),
+                })
+            elif path in questions:
+                k, start, end, user = parse_query(url.query)
+                start_time = time.perf_counter()
+                result = self.store.query(path, k, start, end, user)
+                self.respond(200, {
+                    "question": path,
+                    "k": k,
+                    "start": start,
+                    "end": end,
+                    "user": user,
+                    "result": result,
+                    "seconds": time.perf_counter() - start_time,
+                })
+            else:
+                self.respond(404, {"error": f"unknown path /{path}"})
+        except ValueError as e:
+            self.respond(400, {"error": str(e)})
+        except Exception as e:
+            print(f"Error processing the file: {str(e)}")
+            self.respond(500, {"error": str(e)})
+
+    def respond(self, status: int, body: dict) -> None:
+        payload = orjson.dumps(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(store: TweetStore, host: str = service_host, port: int = service_port, socket_path: Optional[str] = None):
+    """
+    Build the HTTP server of a store, listening on host:port or on a Unix socket.
+
+    Parameters:
+        store (TweetStore): Store answering the queries.
+        host (str, optional): Address to listen on. Defaults to service_host.
+        port (int, optional): Port to listen on. Defaults to service_port.
+        socket_path (str, optional): Path of a Unix socket to listen on instead of host:port. Defaults to None.
+    Returns:
+        The server, to run with serve_forever.
+    """
+    handler = type("BoundQueryHandler", (QueryHandler,), {"store": store})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    In this main function:
+    1. The tweets are indexed once from the selected source into a TweetStore.
+    2. An HTTP server answers q1, q2 and q3 queries from memory until it is interrupted.
+
+    Example:
+        python -m src.common.service --source local --port 8080
+        curl 'http://127.0.0.1:8080/q3?k=5&start=2021-02-12&end=2021-02-13'
+    """
+    parser = argparse.ArgumentParser(description="Serve the q1, q2 and q3 queries from memory.")
+    parser.add_argument("--source", choices=("local", "gcs"), default="local")
+    parser.add_argument("--file", default=json_file_local_path)
+    parser.add_argument("--host", default=service_host)
+    parser.add_argument("--port", type=int, default=service_port)
+    parser.add_argument("--socket", help="Path of a Unix socket to listen on instead of host:port.")
+    parser.add_argument("--cache-size", type=int, default=query_cache_size)
+    parser.add_argument("--check-interval", type=float, default=source_check_interval)
+    args = parser.parse_args(argv)
+
+    store = TweetStore(args.source, args.file, args.check_interval, args.cache_size)
+    store.refresh(force=True)
+    server = make_server(store, args.host, args.port, args.socket)
+    print(f"Serving {store.index.tweets} tweets on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence
+
+import orjson
+
+# Emojis drawn by the generator, most frequent first, with multi code point sequences
+# (flags, skin tones, ZWJ sequences, keycaps) to exercise the emoji matcher.
+emoji_vocabulary = [
+    "🙏", "😂", "🚜", "✊", "🌾", "🇮🇳", "❤️", "👍🏽", "💚", "🔥",
+    "😭", "👇", "✊🏻", "💪", "🙏🏻", "👨‍🌾", "😡", "🤣", "👩‍🌾", "1️⃣",
+]
+filler_words = [
+    "farmers", "protest", "support", "india", "government", "law", "delhi", "today", "we", "stand",
+    "with", "the", "and", "for", "our", "rights", "justice", "peace", "news", "now",
+]
+
+
+def zipf_cum_weights(size: int, exponent: float) -> List[float]:
+    """
+    Cumulative weights of a Zipf distribution over ranks 1..size, for random.choices.
+
+    Parameters:
+        size (int): Number of ranks.
+        exponent (float): Exponent of the distribution, higher means more skewed.
+    Returns:
+        List[float]: The cumulative weights of every rank.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def generate_tweets(
+        count: Optional[int] = None,
+        seed: int = 0,
+        users: int = 100_000,
+        days: int = 30,
+        start: datetime = datetime(2021, 2, 1),
+        exponent: float = 1.1
+) -> Iterator[dict]:
+    """
+    Generate tweets with the schema of the challenge dump, deterministically for a given seed.
+
+    Authors and mentioned users follow a Zipf distribution over the same user base, tweets are
+    spread over the days with a Zipf distribution over a shuffled order of the days (so busy days
+    are not simply the first ones), and every content mixes words, mentions, emojis and,
+    sometimes, an e-mail address, which is not a mention.
+
+    Parameters:
+        count (int, optional): Number of tweets. Defaults to None, an endless stream.
+        seed (int, optional): Seed of the generator. Defaults to 0.
+        users (int, optional): Size of the user base. Defaults to 100_000.
+        days (int, optional): Number of days covered from start. Defaults to 30.
+        start (datetime, optional): First day covered. Defaults to 2021-02-01.
+        exponent (float, optional): Exponent of the Zipf distributions. Defaults to 1.1.
+    Returns:
+        Iterator[dict]: Tweets with 'id', 'date', 'user.username', 'content' and 'mentionedUsers'.
+    """
+    generator = random.Random(seed)
+    user_weights = zipf_cum_weights(users, exponent)
+    user_ranks = range(users)
+    day_order = list(range(days))
+    generator.shuffle(day_order)
+    day_weights = zipf_cum_weights(days, exponent / 2)
+    emoji_weights = zipf_cum_weights(len(emoji_vocabulary), exponent)
+
+    choices, randrange, random_value = generator.choices, generator.randrange, generator.random
+    for tweet_id in itertools.islice(itertools.count(), count):
+        author, *mentioned = choices(user_ranks, cum_weights=user_weights, k=1 + randrange(4) // 2)
+        day = choices(day_order, cum_weights=day_weights)[0]
+        date = start + timedelta(days=day, seconds=randrange(86400))
+
+        words = choices(filler_words, k=randrange(5, 25))
+        words += [f"@user{rank}" for rank in mentioned]
+        words += choices(emoji_vocabulary, cum_weights=emoji_weights, k=randrange(4))
+        if random_value() < 0.05:
+            words.append(f"contact@user{randrange(users)}.org")
+        generator.shuffle(words)
+
+        yield {
+            "id": tweet_id,
+            "date": f"{date.isoformat()}+00:00",
+            "user": {"username": f"user{author}"},
+            "content": " ".join(words),
+            "mentionedUsers": [{"username": f"user{rank}"} for rank in mentioned] or None,
+        }
+
+
+def write_dataset(
+        path: str,
+        size: Optional[int] = None,
+        count: Optional[int] = None,
+        seed: int = 0,
+        batch_size: int = 10_000
+) -> int:
+    """
+    Write a synthetic NDJSON dump of a given size in bytes or number of tweets.
+
+    Tweets are serialized and written batch_size at a time, so memory does not depend on the
+    size of the output. With a size, writing stops at the first line that reaches it.
+
+    Parameters:
+        path (str): Destination file.
+        size (int, optional): Target size in bytes. Defaults to None.
+        count (int, optional): Number of tweets, used when no size is given. Defaults to None.
+        seed (int, optional): Seed of the generator. Defaults to 0.
+        batch_size (int, optional): Number of tweets serialized per write. Defaults to 10_000.
+    Returns:
+        int: The number of tweets written.
+    """
+    if size is None and count is None:
+        raise ValueError("Either size or count must be given")
+
+    tweets = generate_tweets(None if size is not None else count, seed)
+    written_bytes = written_tweets = 0
+    with open(path, 'wb') as file:
+        while size is None or written_bytes < size:
+            lines = []
+            for tweet in itertools.islice(tweets, batch_size):
+                line = orjson.dumps(tweet) + b"\n"
+                lines.append(line)
+                written_bytes += len(line)
+                if size is not None and written_bytes >= size:
+                    break
+            if not lines:
+                break
+            file.write(b"".join(lines))
+            written_tweets += len(lines)
+    return written_tweets
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a size such as "400MB", "4GB" or "1024" into bytes.
+
+    Parameters:
+        value (str): Size with an optional KB, MB or GB suffix (powers of 1024).
+    Returns:
+        int: The size in bytes.
+    """
+    units = {"KB": 2 ** 10, "MB": 2 ** 20, "GB": 2 ** 30}
+    suffix = value[-2:].upper()
+    if suffix in units:
+        return int(float(value[:-2]) * units[suffix])
+    return int(value)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    In this main function:
+    1. A synthetic NDJSON dump is written with the requested size or number of tweets.
+    2. The number of tweets written is printed.
+    """
+    parser = argparse.ArgumentParser(description="Write a synthetic tweet dump.")
+    parser.add_argument("path")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--size", type=parse_size, help="Target size, e.g. 4GB.")
+    group.add_argument("--count", type=int, help="Number of tweets.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    written_tweets = write_dataset(args.path, size=args.size, count=args.count, seed=args.seed)
+    print(f"Wrote {written_tweets} tweets to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import heapq
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class SpaceSaving:
+    """
+    Approximate heavy hitters of a stream with at most capacity counters (Space-Saving algorithm).
+
+    When a new item arrives and every counter is taken, the item with the smallest count is evicted
+    and the new one inherits that count, recorded as its error. Every reported count overestimates
+    the true count by at most its error, which is itself at most total / capacity, and every item
+    whose true count is greater than total / capacity is guaranteed to be tracked.
+
+    Memory is bounded by capacity regardless of the number of distinct items in the stream.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def update(self, items: Iterable[Hashable]) -> None:
+        """
+        Count every item of an iterable once, like Counter.update.
+
+        Parameters:
+            items (Iterable[Hashable]): Items to count.
+        """
+        counts = self.counts
+        for item in items:
+            self.total += 1
+            if item in counts:
+                counts[item] += 1
+            elif len(counts) < self.capacity:
+                counts[item] = 1
+                self.errors[item] = 0
+                heapq.heappush(self._heap, (1, item))
+            else:
+                minimum, evicted = self._pop_minimum()
+                del counts[evicted]
+                del self.errors[evicted]
+                counts[item] = minimum + 1
+                self.errors[item] = minimum
+                heapq.heappush(self._heap, (minimum + 1, item))
+
+    def _pop_minimum(self) -> Tuple[int, Hashable]:
+        # The heap holds stale entries for items whose count grew since they were pushed;
+        # they are re-pushed with their current count until the real minimum is on top.
+        heap, counts = self._heap, self.counts
+        if len(heap) > 4 * self.capacity:
+            self._heap = heap = [(count, item) for item, count in counts.items()]
+            heapq.heapify(heap)
+        while True:
+            count, item = heapq.heappop(heap)
+            if counts.get(item) == count:
+                return count, item
+            if item in counts:
+                heapq.heappush(heap, (counts[item], item))
+
+    def most_common(self, k: int) -> List[Tuple[Hashable, int]]:
+        """
+        The k items with the highest estimated counts, like Counter.most_common.
+
+        Parameters:
+            k (int): Number of items to return.
+        Returns:
+            List[Tuple[Hashable, int]]: (item, estimated count) pairs, highest first.
+        """
+        return heapq.nlargest(k, self.counts.items(), key=lambda pair: pair[1])
+
+    def error_bound(self) -> float:
+        """
+        Maximum overestimation of any reported count.
+
+        Returns:
+            float: total / capacity.
+        """
+        return self.total / self.capacity
+
+    def guaranteed(self, k: int) -> bool:
+        """
+        Whether the top k reported by most_common is exactly the true top k set.
+
+        It holds when the lower bound (count - error) of every reported item is at least the
+        estimated count of the first item left out, which bounds the true count of every item
+        left out, tracked or not.
+
+        Parameters:
+            k (int): Number of items of the top.
+        Returns:
+            bool: True if no item outside the reported top k can rank inside it.
+        """
+        top = heapq.nlargest(k + 1, self.counts.items(), key=lambda pair: pair[1])
+        if len(top) <= k:
+            return not any(self.errors.values())
+        return all(count - self.errors[item] >= top[k][1] for item, count in top[:k])
@@ -0,0 +1,223 @@
+import heapq
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.common.emojis import extract_emojis
+from src.common.engine import Aggregator, projection_for, run_queries
+from src.common.gcs.constants import q1_fields, q2_fields, q3_fields
+from src.common.gcs.google_storage import stream_json_from_local
+from src.common.mentions import extract_mentions
+
+# Number of buckets per day for every granularity.
+granularities = {"day": 1, "hour": 24}
+
+
+class WindowedAggregator(Aggregator):
+    """
+    Top-k items per time bucket (tumbling windows) and over the last buckets (sliding window).
+
+    Tweets are assigned to hour or day buckets with the same 'YYYY-MM-DD' date slicing as q1_time,
+    plus the hour for hourly buckets. Every bucket keeps its own Counter, and a running Counter
+    holds the sum of the buckets of the sliding window. When a tweet of a newer bucket arrives, the
+    window moves forward and the buckets that leave it are looked up by number and subtracted from
+    the running Counter, so the cost of moving the window is proportional to the expired buckets,
+    not to the buckets kept. With a retention, the bucket numbers are also kept in a min-heap, so
+    the buckets that leave the retention are popped from it instead of searched for.
+
+    Tweets may arrive out of order: the window ends at the newest bucket seen (the watermark), older
+    tweets still inside the window or the retention are counted where they belong, and tweets older
+    than the retention are counted as late and dropped.
+    """
+    fields: Tuple[str, ...] = ()
+
+    def __init__(
+            self,
+            name: str,
+            fields: Iterable[str],
+            extract: Callable[[dict], Iterable[str]],
+            granularity: str = "hour",
+            window: int = 24,
+            retention: Optional[int] = None,
+            top: int = 10
+    ):
+        """
+        Parameters:
+            name (str): Name of the aggregator in the engine results.
+            fields (Iterable[str]): Dotted paths read by extract, besides 'date'.
+            extract (Callable[[dict], Iterable[str]]): Items of a tweet to count.
+            granularity (str, optional): Size of the buckets, "hour" or "day". Defaults to "hour".
+            window (int, optional): Number of buckets of the sliding window. Defaults to 24.
+            retention (int, optional): Number of buckets kept for the tumbling results, counted back
+                from the watermark. Defaults to None, which keeps every bucket.
+            top (int, optional): Number of items of every result. Defaults to 10.
+        """
+        if granularity not in granularities:
+            raise ValueError(f"granularity must be one of {sorted(granularities)}")
+        if window < 1 or (retention is not None and retention < window):
+            raise ValueError("window must be at least 1 and retention at least window")
+        self.name = name
+        self.fields = tuple(dict.fromkeys(["date", *fields]))
+        self.extract = extract
+        self.granularity = granularity
+        self.window = window
+        self.retention = retention
+        self.top = top
+        self.buckets: Dict[int, Counter] = {}
+        # Numbers of the buckets, oldest first, to drop them when they leave the retention.
+        self._retained: List[int] = []
+        self.sliding = Counter()
+        self.watermark: Optional[int] = None
+        self.late = 0
+        self._day_ordinals: Dict[str, int] = {}
+
+    def bucket_of(self, tweet_date: str) -> int:
+        """
+        Bucket number of an ISO 8601 date: the day ordinal, times 24 plus the hour for hourly buckets.
+        """
+        day = tweet_date[:10]
+        ordinal = self._day_ordinals.get(day)
+        if ordinal is None:
+            ordinal = self._day_ordinals[day] = date.fromisoformat(day).toordinal()
+        if self.granularity == "hour":
+            return ordinal * 24 + int(tweet_date[11:13])
+        return ordinal
+
+    def bucket_start(self, bucket: int) -> datetime:
+        """
+        Start of a bucket, as a naive UTC datetime.
+        """
+        per_day = granularities[self.granularity]
+        return datetime.fromordinal(bucket // per_day) + timedelta(hours=(bucket % per_day) * 24 // per_day)
+
+    def update(self, tweet: dict) -> None:
+        bucket = self.bucket_of(tweet["date"])
+        if self.watermark is None or bucket > self.watermark:
+            self._advance(bucket)
+
+        if self.retention is not None and bucket <= self.watermark - self.retention:
+            self.late += 1
+            return
+
+        items = list(self.extract(tweet))
+        if not items:
+            return
+        counter = self.buckets.get(bucket)
+        if counter is None:
+            counter = self._add_bucket(bucket)
+        counter.update(items)
+        if bucket > self.watermark - self.window:
+            self.sliding.update(items)
+
+    def _add_bucket(self, bucket: int) -> Counter:
+        counter = self.buckets[bucket] = Counter()
+        if self.retention is not None:
+            heapq.heappush(self._retained, bucket)
+        return counter
+
+    def _advance(self, watermark: int) -> None:
+        if self.watermark is not None:
+            old_start, new_start = self.watermark - self.window + 1, watermark - self.window + 1
+            # Only the buckets of the old window can leave it, however far the watermark moves.
+            for bucket in range(old_start, min(new_start, old_start + self.window)):
+                expired = self.buckets.get(bucket)
+                if not expired:
+                    continue
+                self.sliding.subtract(expired)
+                for item in expired:
+                    if self.sliding[item] <= 0:
+                        del self.sliding[item]
+        if self.retention is not None:
+            while self._retained and self._retained[0] <= watermark - self.retention:
+                del self.buckets[heapq.heappop(self._retained)]
+        self.watermark = watermark
+
+    def merge(self, other: "WindowedAggregator") -> None:
+        for bucket, counter in other.buckets.items():
+            own = self.buckets.get(bucket)
+            if own is None:
+                own = self._add_bucket(bucket)
+            own.update(counter)
+        self.late += other.late
+        if other.watermark is not None and (self.watermark is None or other.watermark > self.watermark):
+            self._advance(other.watermark)
+        self.sliding = Counter()
+        for bucket, counter in self.buckets.items():
+            if bucket > self.watermark - self.window:
+                self.sliding.update(counter)
+
+    def tumbling(self) -> Dict[datetime, List[Tuple[str, int]]]:
+        """
+        Top items of every retained bucket.
+
+        Returns:
+            Dict[datetime, List[Tuple[str, int]]]: The top items keyed by the start of their bucket, oldest first.
+        """
+        return {
+            self.bucket_start(bucket): self.buckets[bucket].most_common(self.top)
+            for bucket in sorted(self.buckets)
+        }
+
+    def sliding_window(self) -> Dict[Tuple[datetime, datetime], List[Tuple[str, int]]]:
+        """
+        Top items of the sliding window ending at the newest bucket seen.
+
+        Returns:
+            Dict[Tuple[datetime, datetime], List[Tuple[str, int]]]: The top items keyed by the
+            (start, end) of the window, end excluded. Empty when no tweet was seen.
+        """
+        if self.watermark is None:
+            return {}
+        start, end = self.bucket_start(self.watermark - self.window + 1), self.bucket_start(self.watermark + 1)
+        return {(start, end): self.sliding.most_common(self.top)}
+
+    def result(self) -> dict:
+        return {"tumbling": self.tumbling(), "sliding": self.sliding_window(), "late": self.late}
+
+
+def windowed_users(granularity: str = "hour", window: int = 24, **kwargs) -> WindowedAggregator:
+    """
+    Windowed variant of q1: the users that published the most tweets per bucket and window.
+    """
+    return WindowedAggregator(
+        "q1_windowed", q1_fields, lambda tweet: (tweet["user"]["username"],), granularity, window, **kwargs
+    )
+
+
+def windowed_emojis(granularity: str = "hour", window: int = 24, **kwargs) -> WindowedAggregator:
+    """
+    Windowed variant of q2: the most used emojis per bucket and window.
+    """
+    return WindowedAggregator(
+        "q2_windowed", q2_fields, lambda tweet: extract_emojis(tweet.get("content") or ""), granularity, window, **kwargs
+    )
+
+
+def windowed_mentions(granularity: str = "hour", window: int = 24, **kwargs) -> WindowedAggregator:
+    """
+    Windowed variant of q3: the most mentioned users per bucket and window.
+    """
+    return WindowedAggregator(
+        "q3_windowed", q3_fields, lambda tweet: extract_mentions(tweet.get("content") or ""), granularity, window, **kwargs
+    )
+
+
+def main():
+    """
+    In this main function:
+    1. The local tweet JSON is streamed to the windowed q1, q2 and q3 aggregators, with hourly
+       buckets and a sliding window over the last 24 hours.
+    2. The top items of the sliding window and of the last hourly buckets are printed.
+    """
+    aggregators = [windowed_users(), windowed_emojis(), windowed_mentions()]
+    results = run_queries(stream_json_from_local(fields=projection_for(aggregators)), aggregators)
+
+    for aggregator in aggregators:
+        result = results[aggregator.name]["result"]
+        print(f"{aggregator.name} over the last 24 hours: {result['sliding']}")
+        for start, top in list(result["tumbling"].items())[-3:]:
+            print(f"    {start}: {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,37 @@
 import time
+from collections import Counter
 from datetime import datetime
 from functools import partial
-from typing import List, Tuple
+from typing import Iterable, List, Tuple, Union
 
-import dask.dataframe as dd
-import pandas as pd
-from memory_profiler import memory_usage
-
-from src.common.gcs.google_storage import load_json_from_gcs
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.gcs.constants import q1_fields
+from src.common.gcs.google_storage import stream_json_from_gcs
+from src.common.grouping import top_k_by_group, top_k_from_pair_counts
 
 
+@instrumentation.instrumented("q1_memory")
 def q1_memory(
-        gcp_file: List[dict],
+        gcp_file: Union[Iterable[dict], TweetBatch],
         dry_mode: bool = True
 ) -> List[Tuple[datetime.date, str]]:
     """
     Generate a list of the top users by date based on the processed file data.
 
-    This function takes a list of dictionaries containing tweet data and performs the following steps:
-    1. Convert the list of dictionaries into a Pandas DataFrame.
-    2. Extract the 'date' field from the DataFrame and convert it to a datetime object.
-    3. Extract the 'username' field from the 'user' field in the DataFrame.
-    4. Drop the 'user' column from the DataFrame.
-    5. Convert the Pandas DataFrame into a Dask DataFrame for parallel processing.
-    6. Group the Dask DataFrame by 'date' and 'username', and count the occurrences.
-    7. Compute the results of the Dask DataFrame to get a Pandas DataFrame.
-    8. Rename the columns of the Pandas DataFrame.
-    9. Find the top 10 dates with the highest total counts of tweets.
-    10. For each of the top dates, find the username with the highest count of tweets.
-    11. Return a list of tuples, where each tuple contains a date and the corresponding top username.
+    This function takes an iterable of dictionaries containing tweet data and performs the following steps:
+    1. Iterate through each tweet once with top_k_by_group, counting the occurrences of every (date, username) pair.
+    2. Sum the pair counts by date and find the top 10 dates with the highest total counts of tweets.
+    3. For each of the top dates, find the username with the highest count of tweets.
+    4. Return a list of tuples, where each tuple contains a date and the corresponding top username.
+
+    Ties are broken as in q1_time: the earlier date and the username that sorts first win.
+    Since the tweets are consumed one at a time, gcp_file can be a stream such as the one returned
+    by stream_json_from_gcs, and memory is bounded by the number of distinct (date, username) pairs
+    instead of the size of the dump.
 
     Parameters:
-        gcp_file (List[dict]): A list of dictionaries containing tweet data.
+        gcp_file (Union[Iterable[dict], TweetBatch]): An iterable of dictionaries containing tweet data, or a TweetBatch.
         dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
     Returns:
         List[Tuple[datetime.date, str]]: A list of tuples containing the date and the top username for that date.
@@ -40,70 +40,64 @@ def q1_memory(
         print("Processing JSON of tweets")
 
     try:
-        df = pd.DataFrame(gcp_file)
-        df['date'] = pd.to_datetime(df['date']).dt.date
-        df['username'] = df['user'].apply(lambda x: x['username'])
-        df.drop(columns=['user'], inplace=True)
-
-        dask_df = dd.from_pandas(df, npartitions=4)
-
-        user_date_counter = dask_df.groupby(['date', 'username']).size().reset_index()
-        user_date_counter = user_date_counter.compute()
-
-        user_date_counter.columns = ['date', 'username', 'counts']
-        top_dates = user_date_counter.groupby('date')['counts'].sum().nlargest(10).index
-
-        top_users_by_date = []
-        for date in top_dates:
-            top_user = user_date_counter.loc[user_date_counter['date'] == date].nlargest(1, 'counts')
-            top_users_by_date.append((date, top_user['username'].iloc[0]))
-
-        return top_users_by_date
+        if isinstance(gcp_file, TweetBatch):
+            pair_counts = Counter(zip(gcp_file.iso_days(), gcp_file.user_names()))
+            top_users_by_date = top_k_from_pair_counts(pair_counts, k_groups=10, k_items=1)
+        else:
+            top_users_by_date = top_k_by_group(
+                gcp_file,
+                group_key=lambda tweet: tweet["date"][:10],
+                item_key=lambda tweet: tweet["user"]["username"],
+                k_groups=10,
+                k_items=1
+            )
+
+        return [
+            (datetime.strptime(date, "%Y-%m-%d").date(), top_users[0][0])
+            for date, top_users in top_users_by_date
+        ]
     except Exception as e:
+        instrumentation.record_error("q1_memory", e)
         print(f"Error processing the file: {str(e)}")
 
 
 def main():
     """
     In this main function:
-    1. The tweet JSON is obtained from a function that uses the Google Storage service.
-    2. A function is used to process the data using Pandas Dataframe.
-    3. While each function is executed, the execution time of each one is calculated.
-    4. The memory_profiler library is used to measure the memory usage of file processing.
+    1. The tweet JSON is streamed from a function that uses the Google Storage service.
+    2. A function is used to process the stream while it is being downloaded.
+    3. While the function is executed, the execution time is calculated.
+    4. The memory_profiler library is used to measure the peak memory usage of file processing.
 
+    Since the download and the processing overlap, a single time is reported for both of them.
     This method prints information about the execution with the response of the exercise,
-    json download time in seconds, json processing time in seconds and memory used during the process in KB.
+    json download and processing time in seconds and peak memory used during the process in MiB.
     Example:
         Top 10 dates where there are the most tweets:
         [(datetime.date(2021, 2, 12), 'RanbirS00614606'), (datetime.date(2021, 2, 13), 'MaanDee08215437')...]
-        Total time downloading data from GCP: 4.1208250522613525, sec
-        Total time processing tweets: 4.7573747634887695, sec
-        Memory used during the process 1130.40625, KB
+        Total time streaming and processing tweets: ..., sec
+        Peak memory used during the process ..., MiB
     """
-    start_load_time = time.time()
-    gcp_file = load_json_from_gcs()
-    end_load_file = time.time()
+    from memory_profiler import memory_usage
 
     start_processing_time = time.time()
     top_users_by_date = q1_memory(
-        gcp_file=gcp_file,
+        gcp_file=stream_json_from_gcs(fields=q1_fields),
         dry_mode=False
     )
     end_processing_time = time.time()
 
     total_processing_time = end_processing_time - start_processing_time
-    total_load_time = end_load_file - start_load_time
 
-    memory_partial = partial(q1_memory, gcp_file=gcp_file)
-    mem_usage = memory_usage(memory_partial)
+    memory_partial = partial(q1_memory, gcp_file=stream_json_from_gcs(fields=q1_fields))
+    peak_memory = max(memory_usage(memory_partial))
 
     print(
         f"""
     Top 10 dates where there are the most tweets: 
     {top_users_by_date}
-    Total time downloading data from GCP: {total_load_time}, sec
-    Total time processing tweets: {total_processing_time}, sec
-    Memory used during the process {mem_usage[0]}, KB
+    Total time streaming and processing tweets: {total_processing_time}, sec
+    Peak memory used during the process {peak_memory}, MiB
     """
     )
 
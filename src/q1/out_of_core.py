@@ -0,0 +1,83 @@
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from src.common import instrumentation
+from src.common.gcs.constants import dask_blocksize, json_file_local_path, q1_fields
+from src.common.grouping import top_k_from_pair_frame
+from src.common.out_of_core import read_tweets
+
+
+@instrumentation.instrumented("q1_out_of_core")
+def q1_out_of_core(
+        file_path: str = json_file_local_path,
+        blocksize: int = dask_blocksize,
+        storage_options: Optional[dict] = None,
+        dry_mode: bool = True
+) -> List[Tuple[datetime.date, str]]:
+    """
+    Generate a list of the top users by date reading the tweet file partition by partition with Dask.
+
+    This function performs the following steps:
+    1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
+    2. Lazily read the NDJSON file in blocks of blocksize bytes, keeping only 'date' and 'user.username'.
+    3. Count the tweets of every (date, username) pair with a Dask groupby, which reduces the
+       partitions one by one; only the pair counts are brought into memory.
+    4. Find the top 10 dates and the top username of each of them from the pair counts with top_k_from_pair_frame.
+    5. Return a list of tuples, where each tuple contains a date and the corresponding top username.
+
+    Ties are broken as in q1_time: the earlier date and the username that sorts first win.
+
+    Parameters:
+        file_path (str, optional): Local or gs:// path of the NDJSON file. Defaults to json_file_local_path.
+        blocksize (int, optional): Size in bytes of every partition. Defaults to dask_blocksize.
+        storage_options (dict, optional): Filesystem options, e.g. for a local GCS emulator. Defaults to None.
+        dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
+    Returns:
+        List[Tuple[datetime.date, str]]: A list of tuples containing the date and the top username for that date.
+    """
+    if not dry_mode:
+        print("Processing JSON of tweets")
+
+    try:
+        tweets = read_tweets(file_path, q1_fields, blocksize, storage_options)
+        tweets = tweets.assign(date=tweets["date"].str.slice(0, 10))
+        user_date_counter = tweets.groupby(["date", "user.username"]).size().compute().reset_index()
+        user_date_counter.columns = ["group", "item", "counts"]
+        top_users_by_date = top_k_from_pair_frame(user_date_counter, k_groups=10, k_items=1)
+
+        return [
+            (datetime.strptime(date, "%Y-%m-%d").date(), top_users[0][0])
+            for date, top_users in top_users_by_date
+        ]
+    except Exception as e:
+        instrumentation.record_error("q1_out_of_core", e)
+        print(f"Error processing the file: {str(e)}")
+
+
+def main():
+    """
+    In this main function:
+    1. The local tweet JSON is read and reduced partition by partition with Dask.
+    2. While the function is executed, the execution time is calculated.
+
+    This method prints information about the execution with the response of the exercise
+    and the json processing time in seconds.
+    """
+    start_processing_time = time.time()
+    top_users_by_date = q1_out_of_core(dry_mode=False)
+    end_processing_time = time.time()
+
+    total_processing_time = end_processing_time - start_processing_time
+
+    print(
+        f"""
+    Top 10 dates where there are the most tweets: 
+    {top_users_by_date}
+    Total time processing tweets: {total_processing_time}, sec
+    """
+    )
+
+
+if __name__ == "__main__":
+    main()
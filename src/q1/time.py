@@ -1,16 +1,20 @@
 import time
 from datetime import datetime
 from functools import partial
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 import pandas as pd
-from memory_profiler import memory_usage
 
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.gcs.constants import q1_fields
 from src.common.gcs.google_storage import load_json_from_gcs
+from src.common.grouping import top_k_by_group_codes
 
 
+@instrumentation.instrumented("q1_time")
 def q1_time(
-        gcp_file: List[dict],
+        gcp_file: Union[List[dict], TweetBatch],
         dry_mode: bool = True
 ) -> List[Tuple[datetime.date, str]]:
     """
@@ -18,17 +22,19 @@ def q1_time(
 
     This function takes a list of dictionaries containing tweet data and performs the following steps:
     1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
-    2. Convert the list of dictionaries into a Pandas DataFrame.
-    3. Extract the 'date' field from the DataFrame and convert it to a datetime object.
-    4. Extract the 'username' field from the 'user' field in the DataFrame.
-    5. Drop the 'user' column from the DataFrame.
-    6. Group the DataFrame by 'date' and 'username', and count the occurrences.
-    7. Find the top 10 dates with the highest total counts of tweets.
-    8. For each of the top dates, find the username with the highest count of tweets.
-    9. Return a list of tuples, where each tuple contains a date and the corresponding top username.
+    2. Extract the day ('YYYY-MM-DD' prefix of the 'date' field) and the 'username' of every tweet,
+       or take the day ordinals and username codes of a TweetBatch as they are.
+    3. Encode days and usernames as sorted integer codes, so the rest of the work runs on int columns.
+    4. Find the top 10 dates by number of tweets and the top username of each of them with
+       top_k_by_group_codes, which counts the (date, username) pairs with a single groupby.
+    5. Return a list of tuples, where each tuple contains a date and the corresponding top username.
+
+    Ties are broken deterministically: between dates with the same number of tweets the earlier date
+    ranks first, and between users with the same number of tweets on a date the username that sorts
+    first wins. Dates are assumed to be ISO 8601 strings in UTC, as in the challenge dump.
 
     Parameters:
-        gcp_file (List[dict]): A list of dictionaries containing tweet data.
+        gcp_file (Union[List[dict], TweetBatch]): A list of dictionaries containing tweet data, or a TweetBatch.
         dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
     Returns:
         List[Tuple[datetime.date, str]]: A list of tuples containing the date and the top username for that date.
@@ -36,27 +42,20 @@ def q1_time(
     if not dry_mode:
         print("Processing JSON of tweets")
     try:
-        df = pd.DataFrame(gcp_file)
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df["username"] = df["user"].apply(lambda x: x["username"])
-        df.drop(columns=["user"], inplace=True)
-
-        user_date_counter = (
-            df.groupby(["date", "username"]).size().reset_index(name="counts")
-        )
-        top_dates = (
-            user_date_counter.groupby("date")["counts"].sum().nlargest(10).index.tolist()
-        )
-
-        top_users_by_date = []
-        for date in top_dates:
-            top_user = user_date_counter.loc[user_date_counter["date"] == date].nlargest(
-                1, "counts"
-            )
-            top_users_by_date.append((date, top_user["username"].iloc[0]))
-
-        return top_users_by_date
+        if isinstance(gcp_file, TweetBatch):
+            date_codes, ordinals = pd.factorize(pd.Series(gcp_file.days, dtype="int32"), sort=True)
+            dates = [datetime.fromordinal(ordinal).date() for ordinal in ordinals]
+            user_codes, usernames = gcp_file.sorted_user_codes()
+        else:
+            date_codes, days = pd.factorize([tweet["date"][:10] for tweet in gcp_file], sort=True)
+            dates = [datetime.strptime(day, "%Y-%m-%d").date() for day in days]
+            user_codes, usernames = pd.factorize([tweet["user"]["username"] for tweet in gcp_file], sort=True)
+
+        top_users_by_date = top_k_by_group_codes(date_codes, user_codes, k_groups=10, k_items=1)
+
+        return [(dates[date], usernames[top_users[0][0]]) for date, top_users in top_users_by_date]
     except Exception as e:
+        instrumentation.record_error("q1_time", e)
         print(f"Error processing the file: {str(e)}")
 
 
@@ -66,19 +65,21 @@ def main():
     1. The tweet JSON is obtained from a function that uses the Google Storage service.
     2. A function is used to process the data using Dask and Pandas Dataframe.
     3. While each function is executed, the execution time of each one is calculated.
-    4. The memory_profiler library is used to measure the memory usage of file processing.
+    4. The memory_profiler library is used to measure the peak memory usage of file processing.
 
     This method prints information about the execution with the response of the exercise,
-    json download time in seconds, json processing time in seconds and memory used during the process in KB.
+    json download time in seconds, json processing time in seconds and peak memory used during the process in MiB.
     Example:
         Top 10 dates where there are the most tweets:
         [(datetime.date(2021, 2, 12), 'RanbirS00614606'), (datetime.date(2021, 2, 13), 'MaanDee08215437')...]
         Total time downloading data from GCP: 3.91988205909729, sec
         Total time processing tweets: 0.6631908416748047, sec
-        Memory used during the process: 1378.859375, KB
+        Peak memory used during the process: ..., MiB
     """
+    from memory_profiler import memory_usage
+
     start_load_time = time.time()
-    gcp_file = load_json_from_gcs()
+    gcp_file = load_json_from_gcs(fields=q1_fields)
     end_load_file = time.time()
 
     start_processing_time = time.time()
@@ -92,14 +93,14 @@ def main():
     total_load_time = end_load_file - start_load_time
 
     memory_partial = partial(q1_time, gcp_file=gcp_file)
-    mem_usage = memory_usage(memory_partial)
+    peak_memory = max(memory_usage(memory_partial))
 
     print(f"""
     Top 10 dates where there are the most tweets: 
     {top_users_by_date}
     Total time downloading data from GCP: {total_load_time}, sec
     Total time processing tweets: {total_processing_time}, sec
-    Memory used during the process: {mem_usage[0]}, KB
+    Peak memory used during the process: {peak_memory}, MiB
     """)
 
 
@@ -1,30 +1,41 @@
 import time
 from collections import Counter
 from functools import partial
-from typing import List, Tuple
-
-import emoji
-from memory_profiler import memory_usage
-
-from src.common.gcs.google_storage import load_json_from_gcs
-
-
-def q2_memory(gcp_file: List[dict], dry_mode: bool = True) -> List[Tuple[str, int]]:
+from typing import Iterable, List, Optional, Tuple, Union
+
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.emojis import extract_emojis
+from src.common.gcs.constants import q2_fields
+from src.common.gcs.google_storage import stream_json_from_gcs
+from src.common.topk import SpaceSaving
+
+
+@instrumentation.instrumented("q2_memory")
+def q2_memory(
+        gcp_file: Union[Iterable[dict], TweetBatch],
+        dry_mode: bool = True,
+        capacity: Optional[int] = None
+) -> List[Tuple[str, int]]:
     """
     Process the tweet data to generate a list of the top emojis used.
 
-    This function takes a list of dictionaries containing tweet data and performs the following steps:
+    This function takes an iterable of dictionaries containing tweet data and performs the following steps:
     1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
-    2. Initialize a Counter object to count the occurrences of each emoji.
+    2. Initialize a Counter object to count the occurrences of each emoji, or a SpaceSaving
+       summary of at most capacity emojis when a capacity is given.
     3. Iterate through each tweet in the data and extract the text content.
-    4. Extract emojis from the text content using the emoji library.
+    4. Extract the complete emoji sequences from the text content with the precompiled emoji matcher.
     5. Update the emoji counter with the extracted emojis.
     6. Find the top 10 emojis with the highest counts.
     7. Return a list of tuples, where each tuple contains an emoji and its count.
 
     Parameters:
-        gcp_file (List[dict]): A list of dictionaries containing tweet data.
+        gcp_file (Union[Iterable[dict], TweetBatch]): An iterable of dictionaries containing tweet data, or a TweetBatch.
         dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
+        capacity (int, optional): Memory budget of the approximate mode, in number of tracked emojis.
+            Counts may then overestimate, and the error bound is printed when not in dry mode.
+            Defaults to None, which counts every emoji exactly.
 
     Returns:
         List[Tuple[str, int]]: A list of tuples containing the emoji and its count, representing the top 10 emojis used.
@@ -32,58 +43,63 @@ def q2_memory(gcp_file: List[dict], dry_mode: bool = True) -> List[Tuple[str, in
     if not dry_mode:
         print("Processing JSON of tweets")
     try:
-        emoji_counter = Counter()
+        emoji_counter = Counter() if capacity is None else SpaceSaving(capacity)
+
+        if isinstance(gcp_file, TweetBatch):
+            texts = gcp_file.iter_contents()
+        else:
+            texts = (tweet.get("content") or "" for tweet in gcp_file)
 
-        for tweet in gcp_file:
-            text = tweet.get("content", "")
-            emojis = [c for c in text if c in emoji.UNICODE_EMOJI["en"]]
-            emoji_counter.update(emojis)
+        for text in texts:
+            emoji_counter.update(extract_emojis(text))
 
         top_emojis = emoji_counter.most_common(10)
+        if capacity is not None and not dry_mode:
+            print(
+                f"Counts overestimate by at most {emoji_counter.error_bound()}, "
+                f"exact top 10 guaranteed: {emoji_counter.guaranteed(10)}"
+            )
 
         return top_emojis
     except Exception as e:
+        instrumentation.record_error("q2_memory", e)
         print(f"Error processing the file: {str(e)}")
 
 
 def main():
     """
     In this main function:
-    1. The tweet JSON is obtained from a function that uses the Google Storage service.
-    2. A function is used to process the data using Dask and Pandas Dataframe.
-    3. While each function is executed, the execution time of each one is calculated.
-    4. The memory_profiler library is used to measure the memory usage of file processing.
+    1. The tweet JSON is streamed from a function that uses the Google Storage service.
+    2. A function is used to process the stream while it is being downloaded.
+    3. While the function is executed, the execution time is calculated.
+    4. The memory_profiler library is used to measure the peak memory usage of file processing.
 
+    Since the read and the processing overlap, a single time is reported for both of them.
     This method prints information about the execution with the response of the exercise,
-    json download time in seconds, json processing time in seconds and memory used during the process in KB.
+    json download and processing time in seconds and peak memory used during the process in MiB.
     Example:
             Top 10 most used emojis:
             [('🙏', 7286), ('😂', 3072), ('🚜', 2972), ('✊', 2411), ('🌾', 2363)...]
-            Total time downloading data from GCP: 21.28494906425476, sec
-            Total time processing tweets: 1.9600829124450684, sec
-            Memory used during the process: 981.90625, KB
+            Total time streaming and processing tweets: ..., sec
+            Peak memory used during the process: ..., MiB
     """
-    start_load_time = time.time()
-    gcp_file = load_json_from_gcs()
-    end_load_file = time.time()
+    from memory_profiler import memory_usage
 
     start_processing_time = time.time()
-    top_emojis = q2_memory(gcp_file=gcp_file, dry_mode=False)
+    top_emojis = q2_memory(gcp_file=stream_json_from_gcs(fields=q2_fields), dry_mode=False)
     end_processing_time = time.time()
 
     total_processing_time = end_processing_time - start_processing_time
-    total_load_time = end_load_file - start_load_time
 
-    memory_partial = partial(q2_memory, gcp_file=gcp_file)
-    mem_usage = memory_usage(memory_partial)
+    memory_partial = partial(q2_memory, gcp_file=stream_json_from_gcs(fields=q2_fields))
+    peak_memory = max(memory_usage(memory_partial))
 
     print(
         f"""
             Top 10 most used emojis: 
             {top_emojis}
-            Total time downloading data from GCP: {total_load_time}, sec
-            Total time processing tweets: {total_processing_time}, sec
-            Memory used during the process: {mem_usage[0]}, KB
+            Total time streaming and processing tweets: {total_processing_time}, sec
+            Peak memory used during the process: {peak_memory}, MiB
         """
     )
 
@@ -0,0 +1,75 @@
+import time
+from typing import List, Optional, Tuple
+
+from src.common import instrumentation
+from src.common.emojis import extract_emojis
+from src.common.gcs.constants import dask_blocksize, json_file_local_path, q2_fields
+from src.common.out_of_core import read_tweets
+
+
+@instrumentation.instrumented("q2_out_of_core")
+def q2_out_of_core(
+        file_path: str = json_file_local_path,
+        blocksize: int = dask_blocksize,
+        storage_options: Optional[dict] = None,
+        dry_mode: bool = True
+) -> List[Tuple[str, int]]:
+    """
+    Generate a list of the top 10 emojis used reading the tweet file partition by partition with Dask.
+
+    This function performs the following steps:
+    1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
+    2. Lazily read the NDJSON file in blocks of blocksize bytes, keeping only 'content'.
+    3. Extract the complete emoji sequences of every tweet with the precompiled emoji matcher.
+    4. Count them with a Dask value_counts, which reduces the partitions one by one.
+    5. Find the top 10 emojis used and return them with their counts.
+
+    Parameters:
+        file_path (str, optional): Local or gs:// path of the NDJSON file. Defaults to json_file_local_path.
+        blocksize (int, optional): Size in bytes of every partition. Defaults to dask_blocksize.
+        storage_options (dict, optional): Filesystem options, e.g. for a local GCS emulator. Defaults to None.
+        dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
+
+    Returns:
+        List[Tuple[str, int]]: A list of tuples containing the top 10 emojis used and their counts.
+    """
+    if not dry_mode:
+        print("Processing JSON of tweets")
+
+    try:
+        tweets = read_tweets(file_path, q2_fields, blocksize, storage_options)
+        counts = tweets["content"].fillna("").map(extract_emojis, meta=("content", object)).explode().dropna().value_counts()
+        top = counts.nlargest(10).compute()
+
+        return [(item, int(count)) for item, count in top.items()]
+    except Exception as e:
+        instrumentation.record_error("q2_out_of_core", e)
+        print(f"Error processing the file: {str(e)}")
+
+
+def main():
+    """
+    In this main function:
+    1. The local tweet JSON is read and reduced partition by partition with Dask.
+    2. While the function is executed, the execution time is calculated.
+
+    This method prints information about the execution with the response of the exercise
+    and the json processing time in seconds.
+    """
+    start_processing_time = time.time()
+    top_emojis = q2_out_of_core(dry_mode=False)
+    end_processing_time = time.time()
+
+    total_processing_time = end_processing_time - start_processing_time
+
+    print(
+        f"""
+            Top 10 most used emojis: 
+            {top_emojis}
+            Total time processing tweets: {total_processing_time}, sec
+        """
+    )
+
+
+if __name__ == "__main__":
+    main()
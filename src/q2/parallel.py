@@ -0,0 +1,68 @@
+import time
+from typing import List, Optional, Tuple
+
+from src.common import instrumentation
+from src.common.engine import EmojiAggregator
+from src.common.gcs.constants import json_file_local_path
+from src.common.parallel import run_sharded
+
+
+@instrumentation.instrumented("q2_parallel")
+def q2_parallel(
+        file_path: str = json_file_local_path,
+        workers: Optional[int] = None,
+        dry_mode: bool = True
+) -> List[Tuple[str, int]]:
+    """
+    Process the tweet file with a pool of processes to generate a list of the top 10 emojis used.
+
+    This function performs the following steps:
+    1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
+    2. Split the NDJSON file into one byte range per worker, aligned on line boundaries.
+    3. In every worker process, parse its range and count the emojis used into a Counter.
+    4. Merge the partial Counters and find the top 10 emojis used.
+
+    Parameters:
+        file_path (str, optional): Path of the NDJSON file. Defaults to json_file_local_path.
+        workers (int, optional): Number of processes. Defaults to None, the number of CPUs.
+        dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
+
+    Returns:
+        List[Tuple[str, int]]: A list of tuples containing the top 10 emojis used and their counts.
+    """
+    if not dry_mode:
+        print("Processing JSON of tweets")
+
+    try:
+        return run_sharded(EmojiAggregator, file_path, workers).result()
+    except Exception as e:
+        instrumentation.record_error("q2_parallel", e)
+        print(f"Error processing the file: {str(e)}")
+
+
+def main():
+    """
+    In this main function:
+    1. The local tweet JSON is split into shards that are processed by a pool of processes.
+    2. While the function is executed, the execution time is calculated.
+
+    This method prints information about the execution with the response of the exercise
+    and the json processing time in seconds.
+    """
+    start_processing_time = time.time()
+    top_emojis = q2_parallel(dry_mode=False)
+    end_processing_time = time.time()
+
+    total_processing_time = end_processing_time - start_processing_time
+
+    print(
+        f"""
+            Top 10 most used emojis: 
+            {top_emojis}
+            Total time processing tweets: {total_processing_time}, sec
+        """
+    )
+
+
+if __name__ == "__main__":
+    main()
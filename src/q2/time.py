@@ -1,17 +1,21 @@
 import time
+from collections import Counter
 from datetime import datetime
 from functools import partial
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
-import emoji
 import pandas as pd
-from memory_profiler import memory_usage
 
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.emojis import extract_emojis
+from src.common.gcs.constants import q2_fields
 from src.common.gcs.google_storage import load_json_from_gcs
 
 
+@instrumentation.instrumented("q2_time")
 def q2_time(
-        gcp_file: List[dict],
+        gcp_file: Union[List[dict], TweetBatch],
         dry_mode: bool = True
 ) -> List[Tuple[datetime.date, str]]:
     """
@@ -19,9 +23,9 @@ def q2_time(
 
     This function takes a list of dictionaries containing tweet data and performs the following steps:
     1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
-    2. Initialize an empty dictionary to store emoji counts.
-    3. Iterate through each tweet in the data and extract the text content.
-    4. Extract emojis from the text content using the emoji library and update the emoji counts.
+    2. Join the text content of every tweet into a single string (a TweetBatch already stores it joined).
+    3. Extract the complete emoji sequences of that string in one scan with the precompiled emoji matcher.
+    4. Count the occurrences of each emoji.
     5. Convert the dictionary of emoji counts to a pandas DataFrame.
     6. Find the top 10 emojis with the highest counts using the DataFrame.
     7. Convert the DataFrame to a list of tuples, where each tuple contains an emoji and its count.
@@ -34,16 +38,11 @@ def q2_time(
         print("Processing JSON of tweets")
 
     try:
-        emoji_counts = {}
-
-        for tweet in gcp_file:
-            text = tweet.get("content", "")
-            emojis = [c for c in text if c in emoji.UNICODE_EMOJI["en"]]
-            for emoji_char in emojis:
-                if emoji_char in emoji_counts:
-                    emoji_counts[emoji_char] += 1
-                else:
-                    emoji_counts[emoji_char] = 1
+        if isinstance(gcp_file, TweetBatch):
+            contents = gcp_file.joined_content()
+        else:
+            contents = "\n".join(tweet.get("content") or "" for tweet in gcp_file)
+        emoji_counts = Counter(extract_emojis(contents))
 
         df = pd.DataFrame(emoji_counts.items(), columns=["emoji", "count"])
         top_emojis = df.nlargest(10, "count")
@@ -51,6 +50,7 @@ def q2_time(
 
         return top_emojis_list
     except Exception as e:
+        instrumentation.record_error("q2_time", e)
         print(f"Error processing the file: {str(e)}")
 
 
@@ -60,19 +60,21 @@ def main():
     1. The tweet JSON is obtained from a function that uses the Google Storage service.
     2. A function is used to process the data using Pandas Dataframe.
     3. While each function is executed, the execution time of each one is calculated.
-    4. The memory_profiler library is used to measure the memory usage of file processing.
+    4. The memory_profiler library is used to measure the peak memory usage of file processing.
 
     This method prints information about the execution with the response of the exercise,
-    json download time in seconds, json processing time in seconds and memory used during the process in KB.
+    json download time in seconds, json processing time in seconds and peak memory used during the process in MiB.
     Example:
             Top 10 most used emojis:
             [('🙏', 7286), ('😂', 3072), ('🚜', 2972), ('✊', 2411), ('🌾', 2363)...]
             Total time downloading data from GCP: 22.1781587600708, sec
             Total time processing tweets: 1.0470860004425049, sec
-            Memory used during the process 1017.375, KB
+            Peak memory used during the process ..., MiB
     """
+    from memory_profiler import memory_usage
+
     start_load_time = time.time()
-    gcp_file = load_json_from_gcs()
+    gcp_file = load_json_from_gcs(fields=q2_fields)
     end_load_file = time.time()
 
     start_processing_time = time.time()
@@ -86,7 +88,7 @@ def main():
     total_load_time = end_load_file - start_load_time
 
     memory_partial = partial(q2_time, gcp_file=gcp_file)
-    mem_usage = memory_usage(memory_partial)
+    peak_memory = max(memory_usage(memory_partial))
 
     print(
         f"""
@@ -94,7 +96,7 @@ def main():
             {top_emojis}
             Total time downloading data from GCP: {total_load_time}, sec
             Total time processing tweets: {total_processing_time}, sec
-            Memory used during the process {mem_usage[0]}, KB
+            Peak memory used during the process {peak_memory}, MiB
         """
     )
 
@@ -1,30 +1,35 @@
 import time
-from datetime import datetime
+from collections import Counter
 from functools import partial
-from typing import List, Tuple
-
-import pandas as pd
-from memory_profiler import memory_usage
+from typing import List, Tuple, Union
 
+from src.common import instrumentation
+from src.common.batch import TweetBatch
+from src.common.gcs.constants import q3_fields
 from src.common.gcs.google_storage import load_json_from_gcs
+from src.common.mentions import extract_mentions_batch
 
 
+@instrumentation.instrumented("q3_time")
 def q3_time(
-        gcp_file: List[dict],
+        gcp_file: Union[List[dict], TweetBatch],
         dry_mode: bool = True
-) -> List[Tuple[datetime.date, str]]:
+) -> List[Tuple[str, int]]:
     """
     Process the tweet data to generate a list of the top 10 mentioned users.
 
     This function takes a list of dictionaries containing tweet data and performs the following steps:
     1. If dry_mode is False, print a message indicating that the JSON data of tweets is being processed.
-    2. Create a DataFrame from the tweet data and extract mentions (words starting with '@') from the tweet content.
-    3. Explode the DataFrame to separate rows for each mention and filter out empty mentions.
-    4. Count the occurrences of each mention and find the top 10 mentioned users.
-    5. Return a list of tuples containing the top 10 mentioned users and their counts.
+    2. Extract the mentions of the whole content column in a single scan with the shared mention
+       extractor, which follows the Twitter handle rules (see extract_mentions).
+    3. Count the occurrences of each mention and find the top 10 mentioned users.
+    4. Return a list of tuples containing the top 10 mentioned users and their counts.
+
+    The mentions are counted in the same order as q3_memory, so both variants return identical results,
+    ties included.
 
     Parameters:
-        gcp_file (List[dict]): A list of dictionaries containing tweet data.
+        gcp_file (Union[List[dict], TweetBatch]): A list of dictionaries containing tweet data, or a TweetBatch.
         dry_mode (bool, optional): A flag to indicate whether the function is in dry mode. Defaults to True.
 
     Returns:
@@ -34,17 +39,15 @@ def q3_time(
         print("Processing JSON of tweets")
 
     try:
-        df = pd.DataFrame(gcp_file)
-        df['mentions'] = df['content'].str.findall(r'@(\w+)')
-        df_exploded = df.explode('mentions')
-        df_filtered = df_exploded[df_exploded['mentions'] != '']
-        mention_counts = df_filtered['mentions'].value_counts()
-        top_users = mention_counts.head(10)
+        if isinstance(gcp_file, TweetBatch):
+            texts = gcp_file.iter_contents()
+        else:
+            texts = (tweet.get("content") or "" for tweet in gcp_file)
+        mention_counts = Counter(extract_mentions_batch(texts))
 
-        top_users_list = [(user, count) for user, count in top_users.items()]
-
-        return top_users_list
+        return mention_counts.most_common(10)
     except Exception as e:
+        instrumentation.record_error("q3_time", e)
         print(f"Error processing the file: {str(e)}")
 
 
@@ -52,21 +55,23 @@ def main():
     """
     In this main function:
     1. The tweet JSON is obtained from a function that uses the Google Storage service.
-    2. A function is used to process the data using Pandas Dataframe.
+    2. A function is used to process the data with the shared mention extractor.
     3. While each function is executed, the execution time of each one is calculated.
-    4. The memory_profiler library is used to measure the memory usage of file processing.
+    4. The memory_profiler library is used to measure the peak memory usage of file processing.
 
     This method prints information about the execution with the response of the exercise,
-    json download time in seconds, json processing time in seconds and memory used during the process in KB.
+    json download time in seconds, json processing time in seconds and peak memory used during the process in MiB.
     Example:
             The historical top 10 most influential users (username) based on the count of mentions:
             [('narendramodi', 2261), ('Kisanektamorcha', 1836), ('RakeshTikaitBKU', 1639)..]
             Total time downloading data from GCP: 3.838207960128784, sec
             Total time processing tweets: 1.484058141708374, sec
-            Memory used during the process 1287.859375, KB
+            Peak memory used during the process ..., MiB
     """
+    from memory_profiler import memory_usage
+
     start_load_time = time.time()
-    gcp_file = load_json_from_gcs()
+    gcp_file = load_json_from_gcs(fields=q3_fields)
     end_load_file = time.time()
 
     start_processing_time = time.time()
@@ -80,7 +85,7 @@ def main():
     total_load_time = end_load_file - start_load_time
 
     memory_partial = partial(q3_time, gcp_file=gcp_file)
-    mem_usage = memory_usage(memory_partial)
+    peak_memory = max(memory_usage(memory_partial))
 
     print(
         f"""
@@ -88,7 +93,7 @@ def main():
             {top_users}
             Total time downloading data from GCP: {total_load_time}, sec
             Total time processing tweets: {total_processing_time}, sec
-            Memory used during the process {mem_usage[0]}, KB
+            Peak memory used during the process {peak_memory}, MiB
         """
     )
 